@@ -0,0 +1,126 @@
+"""
+betting/accumulators.py
+-----------------------
+Top-K accumulator search shared by every set generator.
+
+Legs are plain bet dicts with at least "match" and "prob". Instead of
+walking itertools.combinations and stopping after the first N hits, the
+search groups legs by fixture, walks distinct fixture combinations (2 to 8
+legs) and picks one market within each, pruning on log-probability upper
+bounds. It never builds a same-match combo and returns the true best sets
+while visiting a small part of the space.
+"""
+
+import heapq
+import itertools
+import math
+from collections import defaultdict
+
+# Supported accumulator sizes: doubles up to 8-folds
+MIN_LEGS = 2
+MAX_LEGS = 8
+
+
+def group_by_match(bets: list) -> list:
+    """
+    Legs indexed by fixture: a list of per-match leg lists, each sorted by
+    probability, with fixtures ordered by their best leg (best first).
+    """
+    by_match = defaultdict(list)
+    for bet in bets:
+        by_match[bet["match"]].append(bet)
+    groups = [sorted(legs, key=lambda b: b["prob"], reverse=True) for legs in by_match.values()]
+    return sorted(groups, key=lambda legs: legs[0]["prob"], reverse=True)
+
+
+def top_k_sets(bets: list, top_k: int, min_prob: float, legs: int = 3,
+               min_leg_prob: float = 0.0, adjust=None, max_adjust: float = 1.0) -> list:
+    """
+    The ``top_k`` most probable ``legs``-leg sets, every leg from a
+    different match, with set probability >= ``min_prob``. Returned as
+    ``[(prob, (leg, ...)), ...]`` sorted best first.
+
+    ``min_leg_prob`` drops weak legs before the search. ``adjust(combo,
+    base_prob)`` optionally rescales a set's probability (correlation
+    penalties, diversity bonuses); ``max_adjust`` must bound that factor
+    from above so pruning stays exact.
+    """
+    if not MIN_LEGS <= legs <= MAX_LEGS:
+        raise ValueError(f"legs must be between {MIN_LEGS} and {MAX_LEGS}, got {legs}")
+    groups = group_by_match([b for b in bets if b["prob"] > 0 and b["prob"] >= min_leg_prob])
+    group_probs = [[b["prob"] for b in group] for group in groups]
+
+    def to_legs(positions):
+        return tuple(groups[x][m] for x, m in positions)
+
+    adjust_positions = None
+    if adjust:
+        def adjust_positions(positions, base):
+            return adjust(to_legs(positions), base)
+
+    found = search_groups(group_probs, legs, top_k, min_prob, adjust_positions, max_adjust)
+    return [(prob, to_legs(positions)) for prob, positions in found]
+
+
+def search_groups(group_probs: list, legs: int, top_k: int, min_prob: float,
+                  adjust=None, max_adjust: float = 1.0) -> list:
+    """
+    Branch-and-bound core over plain probabilities.
+
+    ``group_probs`` holds one probability list per fixture, each sorted
+    descending, with fixtures ordered by their best leg (as produced by
+    ``group_by_match``). Returns ``[(prob, ((fixture, leg), ...)), ...]``
+    best first.
+
+    Bounds are kept in log space: with r legs still to pick from fixtures x
+    onwards, the best completion is the sum of the r best log-probs starting
+    at x (a prefix-sum lookup), so a branch is cut as soon as it cannot
+    reach ``min_prob`` or beat the current k-th best set.
+    """
+    n = len(group_probs)
+    if top_k <= 0 or n < legs:
+        return []
+
+    log_probs = [[math.log(p) for p in probs] for probs in group_probs]
+    best_log = [lp[0] for lp in log_probs]
+    prefix = [0.0, *itertools.accumulate(best_log)]   # prefix[x] = sum(best_log[:x])
+    log_boost = math.log(max_adjust)
+    log_min = math.log(min_prob) if min_prob > 0 else -math.inf
+
+    best = []                       # min-heap of (prob, positions)
+    chosen = []
+
+    def log_floor() -> float:
+        if len(best) < top_k:
+            return log_min
+        return math.log(best[0][0]) if best[0][0] > 0 else -math.inf
+
+    def extend(fixtures, log_sum: float, base: float):
+        remaining = legs - len(chosen)
+        if remaining == 0:
+            positions = tuple(chosen)
+            prob = adjust(positions, base) if adjust else base
+            if prob < min_prob:
+                return
+            if len(best) < top_k:
+                heapq.heappush(best, (prob, positions))
+            elif prob > best[0][0]:
+                heapq.heapreplace(best, (prob, positions))
+            return
+
+        for x in fixtures:
+            if x > n - remaining:
+                break
+            # Best completion from here uses fixtures x .. x + remaining - 1
+            if log_sum + prefix[x + remaining] - prefix[x] + log_boost < log_floor():
+                break
+            rest = prefix[x + remaining] - prefix[x + 1]
+            for m, (p, lp) in enumerate(zip(group_probs[x], log_probs[x])):
+                if log_sum + lp + rest + log_boost < log_floor():
+                    break
+                chosen.append((x, m))
+                extend(range(x + 1, n), log_sum + lp, base * p)
+                chosen.pop()
+
+    extend(range(n), 0.0, 1.0)
+    return sorted(best, key=lambda entry: (-entry[0], entry[1]))
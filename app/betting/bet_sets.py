@@ -1,13 +1,35 @@
-import itertools
+import math
 import streamlit as st
-from models.poisson import score_matrix
+from betting.accumulators import top_k_sets
+from models.market_cache import cached_price_fixtures
+from models.odds import blend_bets
 
 MIN_SINGLE_PROB = 0.30
 MIN_SET_PROB    = 0.40
 MAX_SETS        = 20
-
-
-def generate_sets(fixtures, model="xG Only"):
+SET_LEGS        = 3                # accumulator size, 2–8 legs
+MARKET_PRICING  = "closed_form"   # or "grid" for the adaptive score grid
+
+# Goal markets priced through models.market_cache
+GOAL_MARKETS = [
+    "Over 0.5 Goals",
+    "Over 1.5 Goals",
+    "Over 2.5 Goals",
+    "Under 3.5 Goals",
+    "Under 4.5 Goals",
+    "Both Teams To Score",
+    "Home Win",
+    "Draw",
+    "Away Win",
+]
+
+
+def generate_sets(fixtures, model="xG Only", legs=SET_LEGS, odds=None):
+    """
+    ``model="Market Blended"`` blends each leg with the de-vigged bookmaker
+    price from ``odds`` (a models.odds table, keyed by fixture_id) and uses
+    the best quoted price as the leg's odds instead of the flat-margin ones.
+    """
 
     # ── CHECKPOINT 1: Did we receive any fixtures? ────────────────────────────
     st.write(f"🔍 **[DEBUG 1]** fixtures received: {len(fixtures)} rows")
@@ -46,28 +68,25 @@ def generate_sets(fixtures, model="xG Only"):
             continue
 
         try:
-            matrix = score_matrix(home_xg, away_xg)
+            market_probs = cached_price_fixtures(home_xg, away_xg, GOAL_MARKETS, mode=MARKET_PRICING)[0]
         except Exception as e:
-            st.error(f"❌ score_matrix() crashed for {r.home} vs {r.away} "
+            st.error(f"❌ cached_price_fixtures() crashed for {r.home} vs {r.away} "
                      f"(xG {home_xg}/{away_xg}): {e}")
             continue
 
-        if not matrix:
-            st.warning(f"⚠️ score_matrix() returned empty dict for {r.home} vs {r.away}")
-            continue
-
         # Compute markets
-        over_05            = min(sum(p for (h, a), p in matrix.items() if h + a > 0), 1.0)
-        over_15            = min(sum(p for (h, a), p in matrix.items() if h + a > 1), 1.0)
-        over_25            = min(sum(p for (h, a), p in matrix.items() if h + a > 2), 1.0)
-        under_35           = min(sum(p for (h, a), p in matrix.items() if h + a < 4), 1.0)
-        under_45           = min(sum(p for (h, a), p in matrix.items() if h + a < 5), 1.0)
-        home_win           = min(sum(p for (h, a), p in matrix.items() if h > a), 1.0)
-        draw               = min(sum(p for (h, a), p in matrix.items() if h == a), 1.0)
-        away_win           = min(sum(p for (h, a), p in matrix.items() if h < a), 1.0)
+        market_probs = dict(zip(GOAL_MARKETS, market_probs))
+        over_05            = min(market_probs["Over 0.5 Goals"], 1.0)
+        over_15            = min(market_probs["Over 1.5 Goals"], 1.0)
+        over_25            = min(market_probs["Over 2.5 Goals"], 1.0)
+        under_35           = min(market_probs["Under 3.5 Goals"], 1.0)
+        under_45           = min(market_probs["Under 4.5 Goals"], 1.0)
+        home_win           = min(market_probs["Home Win"], 1.0)
+        draw               = min(market_probs["Draw"], 1.0)
+        away_win           = min(market_probs["Away Win"], 1.0)
         double_chance_home = min(home_win + draw, 1.0)
         double_chance_away = min(away_win + draw, 1.0)
-        btts               = min(sum(p for (h, a), p in matrix.items() if h >= 1 and a >= 1), 1.0)
+        btts               = min(market_probs["Both Teams To Score"], 1.0)
 
         # ── CHECKPOINT 4: Show per-fixture market probabilities ───────────────
         st.write(f"📊 **{r.home} vs {r.away}** (xG: {home_xg:.2f} / {away_xg:.2f})")
@@ -108,6 +127,7 @@ def generate_sets(fixtures, model="xG Only"):
             if prob >= MIN_SINGLE_PROB:
                 bets.append({
                     "match":  f"{r.home} vs {r.away}",
+                    "match_id": str(r.get("fixture_id", "")),
                     "market": market,
                     "prob":   prob,
                     "odds":   fair_odds(prob),
@@ -118,51 +138,42 @@ def generate_sets(fixtures, model="xG Only"):
             st.warning(f"⚠️ No market cleared {MIN_SINGLE_PROB*100:.0f}% threshold "
                        f"for {r.home} vs {r.away} — all markets below threshold.")
 
+    # ── Market blend: de-vigged bookmaker prices, one vectorized pass ────────
+    if model == "Market Blended" and odds is not None:
+        blend_bets(bets, odds)
+        priced = sum("market_prob" in b for b in bets)
+        st.write(f"🔍 **[DEBUG 4b]** legs blended with market prices: {priced}/{len(bets)}")
+
     # ── CHECKPOINT 5: Total bets collected ────────────────────────────────────
     st.write(f"🔍 **[DEBUG 5]** Total individual bets collected: {len(bets)}")
 
-    if len(bets) < 3:
-        st.error(f"❌ Need at least 3 bets from 3 different fixtures to form a set. "
+    if len(bets) < legs:
+        st.error(f"❌ Need at least {legs} bets from {legs} different fixtures to form a set. "
                  f"Only {len(bets)} bets collected. "
                  f"Lower MIN_SINGLE_PROB (currently {MIN_SINGLE_PROB}) "
                  f"or check xG values.")
         return []
 
-    # ── Combine into 3-leg accumulators ──────────────────────────────────────
-    sets = []
-    combos_checked = 0
-
-    for combo in itertools.combinations(bets, 3):
-        matches = {b["match"] for b in combo}
-        if len(matches) < 3:
-            continue
-
-        combined_prob = combo[0]["prob"] * combo[1]["prob"] * combo[2]["prob"]
-        combined_odds = combo[0]["odds"] * combo[1]["odds"] * combo[2]["odds"]
-
-        if combined_prob >= MIN_SET_PROB:
-            sets.append({
-                "bets": list(combo),
-                "prob": round(combined_prob, 6),
-                "odds": round(combined_odds, 3),
-            })
-
-        combos_checked += 1
-        if len(sets) >= MAX_SETS * 10:
-            break
+    # ── Combine into k-leg accumulators ──────────────────────────────────────
+    sets = [
+        {
+            "bets": list(combo),
+            "prob": round(prob, 6),
+            "odds": round(math.prod(b["odds"] for b in combo), 3),
+        }
+        for prob, combo in top_k_sets(bets, MAX_SETS, MIN_SET_PROB, legs=legs)
+    ]
 
     # ── CHECKPOINT 6: Sets found ──────────────────────────────────────────────
-    st.write(f"🔍 **[DEBUG 6]** Combos checked: {combos_checked} | "
-             f"Sets above {MIN_SET_PROB*100:.0f}%: {len(sets)}")
+    st.write(f"🔍 **[DEBUG 6]** Top sets above {MIN_SET_PROB*100:.0f}%: {len(sets)}")
 
     if not sets:
         st.error(
             f"❌ Zero sets found. Best combined prob from your bets: "
             f"{max((b['prob'] for b in bets), default=0)*100:.1f}%. "
-            f"Three of those multiplied: "
-            f"{max((b['prob'] for b in bets), default=0)**3*100:.1f}%. "
+            f"{legs} of those multiplied: "
+            f"{max((b['prob'] for b in bets), default=0)**legs*100:.1f}%. "
             f"MIN_SET_PROB is {MIN_SET_PROB*100:.0f}%."
         )
 
-    sets.sort(key=lambda x: x["prob"], reverse=True)
-    return sets[:MAX_SETS]
+    return sets
@@ -0,0 +1,72 @@
+"""
+betting/ids.py
+--------------
+Stable, content-addressed identifiers for bet sets.
+
+``hash()`` is salted per interpreter (PYTHONHASHSEED), so the old
+``hash(str(combo)) % 1000000`` IDs changed between Streamlit workers and
+restarts and collided at a million. A set ID here is a BLAKE2 digest over
+its canonical legs, the sorted (fixture_id, market) pairs, so the same set
+gets the same ID in every process, regardless of leg order or probability
+revisions. Archives can be merged and deduplicated on it and it is safe to
+use as a cache or widget key.
+"""
+
+import hashlib
+
+# 10 bytes = 20 hex chars: collision-free in practice for any archive size
+DIGEST_SIZE = 10
+# Domain separation; bump if the canonical leg format ever changes
+PERSON = b"fm-set-v1"
+
+
+def leg_key(bet: dict) -> tuple:
+    """Canonical identity of a leg: fixture (ID when known, else name) and market."""
+    return str(bet.get("match_id") or bet["match"]), str(bet["market"])
+
+
+def set_id(bets) -> str:
+    """Deterministic hex digest of a set's legs (order-independent)."""
+    canonical = "\n".join(f"{fixture}\x1f{market}" for fixture, market in sorted(map(leg_key, bets)))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=DIGEST_SIZE,
+                           person=PERSON).hexdigest()
+
+
+def stable_number(text: str, modulo: int) -> int:
+    """Process-independent stand-in for ``hash(text) % modulo`` (mock IDs)."""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % modulo
+
+
+def dedupe_sets(sets: list) -> list:
+    """
+    Drop repeated sets, filling in missing or legacy IDs. The first
+    occurrence keeps its place, but a later copy that carries a tracked
+    ``result`` replaces one that doesn't.
+    """
+    position = {}
+    unique = []
+    for s in sets:
+        s["set_id"] = set_id(s["bets"])
+        i = position.get(s["set_id"])
+        if i is None:
+            position[s["set_id"]] = len(unique)
+            unique.append(s)
+        elif "result" in s and "result" not in unique[i]:
+            unique[i] = s
+    return unique
+
+
+def merge_sets(existing: list, incoming: list) -> list:
+    """
+    Merge a fresh batch into an archived one: incoming sets first (carrying
+    over any tracked ``result`` of the same set), then archived sets that
+    are no longer generated.
+    """
+    archived = {s["set_id"]: s for s in dedupe_sets(existing)}
+    merged = dedupe_sets(incoming)
+    for s in merged:
+        old = archived.pop(s["set_id"], None)
+        if old is not None and "result" in old and "result" not in s:
+            s["result"] = old["result"]
+    return merged + list(archived.values())
@@ -0,0 +1,184 @@
+"""
+betting/incremental.py
+----------------------
+Set-generation state that survives reruns.
+
+When one fixture's xG is revised or a game is postponed, only the sets
+that touch that fixture can change. IncrementalSets keeps the leg index
+(legs grouped by fixture) and a reserve pool of the best sets, and on
+add / remove / update re-evaluates only combinations involving the changed
+fixtures. A full search is only needed when removals drain the reserve.
+
+Pool invariant: every valid set with probability above ``pool_floor`` is in
+the pool, so the top K can always be read straight off it.
+"""
+
+import heapq
+
+from betting.accumulators import MAX_LEGS, MIN_LEGS, group_by_match, search_groups
+
+# Reserve pool size as a multiple of top_k
+RESERVE_FACTOR = 4
+# sync() rebuilds from scratch when more than this share of fixtures changed:
+# one full search beats one partial search per fixture
+BULK_SYNC_FRACTION = 0.5
+
+
+def _set_key(combo) -> tuple:
+    return tuple(sorted((b["match"], b["market"]) for b in combo))
+
+
+class IncrementalSets:
+    """
+    Top-K accumulator state with fixture-level add / remove / update.
+
+    ``adjust`` / ``max_adjust`` have the same meaning as in
+    ``accumulators.top_k_sets``. For 3-leg sets, ``triples`` can replace
+    both with a vectorized scorer shaped like
+    ``scoring.top_k_scored_triples(bets, top_k, min_prob, anchor=None)``;
+    full rebuilds and per-fixture searches then go through it.
+    """
+
+    def __init__(self, top_k: int, min_prob: float, legs: int = 3,
+                 adjust=None, max_adjust: float = 1.0, reserve: int = None, triples=None):
+        if not MIN_LEGS <= legs <= MAX_LEGS:
+            raise ValueError(f"legs must be between {MIN_LEGS} and {MAX_LEGS}, got {legs}")
+        self.top_k = top_k
+        self.min_prob = min_prob
+        self.legs = legs
+        self.adjust = adjust
+        self.max_adjust = max_adjust
+        self.reserve = reserve or top_k * RESERVE_FACTOR
+        if triples is not None and legs != 3:
+            raise ValueError(f"triples scores 3-leg sets, got legs={legs}")
+        self.triples = triples
+
+        self.fixtures = {}          # match -> list of leg dicts (the leg index)
+        self.pool = {}              # set key -> (prob, combo)
+        self.pool_floor = min_prob
+        self.evaluations = 0        # searches run since creation, full or partial
+
+    # ── Public API ─────────────────────────────────────────────────────────────
+
+    def top(self) -> list:
+        """Current best sets as ``[(prob, combo), ...]``, best first."""
+        best = heapq.nsmallest(self.top_k, self.pool.values(),
+                               key=lambda entry: (-entry[0], _set_key(entry[1])))
+        return list(best)
+
+    def add_fixture(self, match: str, bets: list):
+        """Add (or replace) one fixture's legs and price only the sets that use them."""
+        if match in self.fixtures:
+            self.remove_fixture(match)
+        bets = [b for b in bets if b["prob"] > 0]
+        if not bets:
+            return
+        self.fixtures[match] = bets
+        self._add_sets_touching(match)
+
+    def update_fixture(self, match: str, bets: list):
+        self.add_fixture(match, bets)
+
+    def remove_fixture(self, match: str):
+        """Drop a fixture and every set that uses it."""
+        if self.fixtures.pop(match, None) is None:
+            return
+        self.pool = {
+            key: entry for key, entry in self.pool.items()
+            if all(b["match"] != match for b in entry[1])
+        }
+        # Sets below the floor were never kept; if too few remain, search again
+        if len(self.pool) < self.top_k and self.pool_floor > self.min_prob:
+            self.rebuild()
+
+    def sync(self, bets: list) -> dict:
+        """
+        Bring the state in line with a full bet list, touching only fixtures
+        whose legs changed. An empty state, or a diff covering most fixtures,
+        is loaded in one full search instead. Returns counts of
+        added/updated/removed fixtures.
+        """
+        incoming = {}
+        for bet in bets:
+            incoming.setdefault(bet["match"], []).append(bet)
+
+        def signature(legs):
+            return sorted((b["market"], b["prob"]) for b in legs)
+
+        removed = [m for m in self.fixtures if m not in incoming]
+        added = [m for m in incoming if m not in self.fixtures]
+        updated = [m for m in incoming
+                   if m in self.fixtures and signature(incoming[m]) != signature(self.fixtures[m])]
+
+        changed = len(added) + len(updated) + len(removed)
+        if not self.fixtures or changed > BULK_SYNC_FRACTION * max(len(incoming), 1):
+            self.fixtures = {}
+            for match, legs in incoming.items():
+                legs = [b for b in legs if b["prob"] > 0]
+                if legs:
+                    self.fixtures[match] = legs
+            self.rebuild()
+            return {"added": len(added), "updated": len(updated), "removed": len(removed)}
+
+        for match in removed:
+            self.remove_fixture(match)
+        for match in added + updated:
+            self.add_fixture(match, incoming[match])
+        return {"added": len(added), "updated": len(updated), "removed": len(removed)}
+
+    def rebuild(self):
+        """Full search over every fixture — used only when the reserve runs dry."""
+        bets = [b for legs in self.fixtures.values() for b in legs]
+        self.evaluations += 1
+        self.pool = {}
+        self.pool_floor = self.min_prob
+        if self.triples:
+            self._merge(self.triples(bets, self.reserve, self.min_prob))
+            return
+        groups = group_by_match(bets)
+        found = self._search(groups, self.legs, self.min_prob, self.adjust)
+        self._merge((prob, tuple(groups[x][m] for x, m in positions)) for prob, positions in found)
+
+    # ── Internals ──────────────────────────────────────────────────────────────
+
+    def _search(self, groups, legs, min_prob, adjust):
+        def adjust_positions(positions, base):
+            return adjust(tuple(groups[x][m] for x, m in positions), base)
+
+        group_probs = [[b["prob"] for b in group] for group in groups]
+        return search_groups(group_probs, legs, self.reserve, min_prob,
+                             adjust_positions if adjust else None, self.max_adjust)
+
+    def _add_sets_touching(self, match: str):
+        """Every set that uses ``match``: pick one of its legs, search the rest."""
+        if self.triples:
+            others = [b for m, legs in self.fixtures.items() if m != match for b in legs]
+            self.evaluations += 1
+            self._merge(self.triples(others, self.reserve, self.pool_floor,
+                                     anchor=self.fixtures[match]))
+            return
+        others = group_by_match([b for m, legs in self.fixtures.items() if m != match for b in legs])
+        for leg in self.fixtures[match]:
+            if leg["prob"] * self.max_adjust < self.pool_floor:
+                continue
+
+            adjust = None
+            if self.adjust:
+                def adjust(rest, base, leg=leg):
+                    return self.adjust((leg, *rest), base * leg["prob"]) / leg["prob"]
+
+            found = self._search(others, self.legs - 1, self.pool_floor / leg["prob"], adjust)
+            self.evaluations += 1
+            self._merge(
+                (prob * leg["prob"], (leg, *(others[x][m] for x, m in positions)))
+                for prob, positions in found
+            )
+
+    def _merge(self, entries):
+        for prob, combo in entries:
+            if prob >= self.pool_floor:
+                self.pool[_set_key(combo)] = (prob, combo)
+        if len(self.pool) >= self.reserve:
+            kept = heapq.nlargest(self.reserve, self.pool.items(), key=lambda item: item[1][0])
+            self.pool = dict(kept)
+            self.pool_floor = max(self.pool_floor, kept[-1][1][0])
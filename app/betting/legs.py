@@ -0,0 +1,124 @@
+"""
+betting/legs.py
+---------------
+Compact leg and set representation.
+
+Bet legs used to be dicts repeating the match, market and league strings,
+and every set carried full copies of its leg dicts into the HTML, the
+archive and the CSV. Here the legs live once in a columnar LegTable
+(probability array plus interned category codes), sets are just
+``(prob, (leg_index, ...))`` and dict views are only materialized at the
+UI / export boundary.
+
+The search engines index legs as ``leg["match"]`` / ``leg["prob"]``; the
+slotted Leg rows support that directly, so they can be passed anywhere a
+bet dict list was.
+"""
+
+import sys
+
+import numpy as np
+
+# Leg columns stored as category codes (string value interned once per table)
+CATEGORY_COLUMNS = ("match", "market", "league", "match_id")
+
+
+class Leg:
+    """One row of a LegTable as the engines see it: codes instead of strings."""
+
+    __slots__ = ("index", "match", "market", "league", "prob")
+
+    def __init__(self, index: int, match: int, market: int, league: int, prob: float):
+        self.index = index
+        self.match = match
+        self.market = market
+        self.league = league
+        self.prob = prob
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+class LegTable:
+    """Columnar leg store: ``prob`` array plus one int32 code column per category."""
+
+    __slots__ = ("prob", "codes", "categories", "_legs")
+
+    def __init__(self, prob, codes: dict, categories: dict):
+        self.prob = np.asarray(prob, dtype=np.float64)
+        self.codes = {col: np.asarray(codes[col], dtype=np.int32) for col in CATEGORY_COLUMNS}
+        self.categories = categories
+        self._legs = None
+
+    @classmethod
+    def from_bets(cls, bets: list) -> "LegTable":
+        """Build from bet dicts (missing category fields become None)."""
+        categories = {col: [] for col in CATEGORY_COLUMNS}
+        lookups = {col: {} for col in CATEGORY_COLUMNS}
+        codes = {col: [] for col in CATEGORY_COLUMNS}
+        for bet in bets:
+            for col in CATEGORY_COLUMNS:
+                value = bet.get(col)
+                if isinstance(value, str):
+                    value = sys.intern(value)
+                code = lookups[col].get(value)
+                if code is None:
+                    code = lookups[col][value] = len(categories[col])
+                    categories[col].append(value)
+                codes[col].append(code)
+        return cls([b["prob"] for b in bets], codes, categories)
+
+    def __len__(self) -> int:
+        return self.prob.size
+
+    @property
+    def legs(self) -> list:
+        """Slotted rows for the search engines (built once, shared by every search)."""
+        if self._legs is None:
+            match, market, league = (self.codes[c].tolist() for c in ("match", "market", "league"))
+            self._legs = [
+                Leg(i, match[i], market[i], league[i], p)
+                for i, p in enumerate(self.prob.tolist())
+            ]
+        return self._legs
+
+    # ── Sets ──────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def compact(found) -> list:
+        """Engine output ``[(prob, (Leg, ...)), ...]`` -> ``[(prob, (index, ...)), ...]``."""
+        return [(prob, tuple(leg.index for leg in combo)) for prob, combo in found]
+
+    # ── Dict views (UI / export boundary only) ─────────────────────────────────
+
+    def leg_dict(self, index: int) -> dict:
+        view = {col: self.categories[col][self.codes[col][index]] for col in CATEGORY_COLUMNS}
+        view["prob"] = float(self.prob[index])
+        return {key: value for key, value in view.items() if value is not None}
+
+    def set_dict(self, prob: float, indices, **extra) -> dict:
+        return {"bets": [self.leg_dict(i) for i in indices], "prob": prob, **extra}
+
+    def payload(self, sets: list, **extra) -> dict:
+        """
+        JSON-ready compact form: categories and leg columns once, sets as
+        index lists. Expanded client-side (or by ``from_payload``).
+        """
+        return {
+            "categories": self.categories,
+            "legs": {"prob": self.prob.tolist(),
+                     **{col: self.codes[col].tolist() for col in CATEGORY_COLUMNS}},
+            "sets": [[prob, list(indices)] for prob, indices in sets],
+            **extra,
+        }
+
+    @classmethod
+    def from_payload(cls, payload: dict):
+        """Inverse of ``payload``: returns ``(table, sets)``."""
+        legs = payload["legs"]
+        table = cls(legs["prob"], {col: legs[col] for col in CATEGORY_COLUMNS},
+                    payload["categories"])
+        return table, [(prob, tuple(indices)) for prob, indices in payload["sets"]]
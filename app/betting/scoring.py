@@ -0,0 +1,166 @@
+"""
+betting/scoring.py
+------------------
+Vectorized 3-leg set scoring.
+
+Legs are encoded as parallel arrays (probability plus integer fixture,
+league and market codes) and every valid triple is scored in chunked
+broadcast blocks. The correlation and diversity rules become integer ops:
+the number of equal pairs among three codes is 0 (all different), 1 (two
+equal) or 3 (all equal), which indexes straight into a factor table.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+# Factor by number of equal league pairs / market pairs (index 2 cannot occur)
+ELITE_LEAGUE_FACTORS = (1.0, 0.98, 0.98, 0.95)   # correlation penalty
+ELITE_MARKET_FACTORS = (1.02, 1.0, 1.0, 0.97)    # diversity bonus
+
+# Upper bound on cells per broadcast block (first legs x second x third)
+CHUNK_CELLS = 2_000_000
+
+
+class LegArrays(NamedTuple):
+    prob: np.ndarray
+    fixture: np.ndarray
+    league: np.ndarray
+    market: np.ndarray
+
+
+def _codes(values) -> np.ndarray:
+    lookup = {}
+    return np.array([lookup.setdefault(v, len(lookup)) for v in values], dtype=np.int32)
+
+
+def encode_legs(bets: list) -> LegArrays:
+    """Bet dicts -> parallel arrays with interned fixture/league/market codes."""
+    return LegArrays(
+        prob=np.array([b["prob"] for b in bets], dtype=float),
+        fixture=_codes(b["match"] for b in bets),
+        league=_codes(b.get("league") for b in bets),
+        market=_codes(b["market"] for b in bets),
+    )
+
+
+def _equal_pairs(codes, i, j, k) -> np.ndarray:
+    return ((codes[i] == codes[j]).astype(np.int8)
+            + (codes[i] == codes[k]) + (codes[j] == codes[k]))
+
+
+def top_k_scored_triples(bets: list, top_k: int, min_prob: float,
+                         league_factors=ELITE_LEAGUE_FACTORS,
+                         market_factors=ELITE_MARKET_FACTORS, anchor: list = None) -> list:
+    """
+    The ``top_k`` best 3-leg sets from 3 different matches, scored as
+    p1 * p2 * p3 * league_factor * market_factor and kept when >= ``min_prob``.
+    Same return shape as ``accumulators.top_k_sets``.
+
+    Legs are sorted by probability and processed in blocks of first legs;
+    each block is a (block x m x m) broadcast over the m legs that can still
+    complete a qualifying set. Blocks stop once even the best remaining
+    triple cannot beat the current floor.
+
+    With ``anchor`` (the legs of one fixture, not in ``bets``), only sets of
+    one anchor leg plus two legs of ``bets`` are scored: the sets an
+    incremental update of that fixture has to re-price.
+    """
+    if anchor is not None:
+        return _top_k_anchored(anchor, bets, top_k, min_prob, league_factors, market_factors)
+    if top_k <= 0 or len(bets) < 3:
+        return []
+
+    legs = sorted(bets, key=lambda b: b["prob"], reverse=True)
+    enc = encode_legs(legs)
+    p = enc.prob
+    n = len(legs)
+    tables = (np.asarray(league_factors, dtype=float), np.asarray(market_factors, dtype=float))
+    boost = tables[0].max() * tables[1].max()
+
+    best = (np.empty(0), np.empty((0, 3), dtype=np.int64))
+    floor = min_prob
+
+    start, block = 0, 1
+    while start < n - 2:
+        if p[start] * p[start + 1] * p[start + 2] * boost < floor:
+            break
+        # Third legs below floor / (p[start] * p[start + 1] * boost) can never qualify
+        cutoff = floor / (p[start] * p[start + 1] * boost)
+        end = max(start + 3, int(np.count_nonzero(p >= cutoff)))
+        rest = np.arange(start, min(end, n))
+        # Small blocks first so the top-K floor rises early, then grow
+        block = min(block * 2, max(1, CHUNK_CELLS // (rest.size * rest.size)))
+        first = rest[:block]
+
+        best, floor = _score_block(enc, tables, first, rest, best, floor, top_k)
+        start += first.size
+
+    return _ranked(legs, *best)
+
+
+def _top_k_anchored(anchor, others, top_k, min_prob, league_factors, market_factors) -> list:
+    """``top_k_scored_triples`` restricted to one anchor leg plus two ``others``."""
+    if top_k <= 0 or not anchor or len(others) < 2:
+        return []
+
+    a = len(anchor)
+    legs = (sorted(anchor, key=lambda b: b["prob"], reverse=True)
+            + sorted(others, key=lambda b: b["prob"], reverse=True))
+    enc = encode_legs(legs)
+    p = enc.prob
+    tables = (np.asarray(league_factors, dtype=float), np.asarray(market_factors, dtype=float))
+    boost = tables[0].max() * tables[1].max()
+
+    best = (np.empty(0), np.empty((0, 3), dtype=np.int64))
+    floor = min_prob
+
+    start = 0
+    while start < a:
+        if p[start] * p[a] * p[a + 1] * boost < floor:
+            break
+        # Partner legs below floor / (p[start] * p[a] * boost) can never qualify
+        cutoff = floor / (p[start] * p[a] * boost)
+        rest = np.arange(a, a + max(2, int(np.count_nonzero(p[a:] >= cutoff))))
+        first = np.arange(start, min(a, start + max(1, CHUNK_CELLS // (rest.size * rest.size))))
+
+        best, floor = _score_block(enc, tables, first, rest, best, floor, top_k)
+        start += first.size
+
+    return _ranked(legs, *best)
+
+
+def _score_block(enc, tables, first, rest, best, floor, top_k):
+    """
+    Score every valid triple (first leg from ``first``, then two ascending
+    ``rest`` legs) and fold the ones >= ``floor`` into the ``best`` arrays.
+    Returns the updated ``best`` and floor.
+    """
+    p = enc.prob
+    i = first[:, None, None]
+    j = rest[None, :, None]
+    k = rest[None, None, :]
+
+    valid = (i < j) & (j < k)
+    valid &= _equal_pairs(enc.fixture, i, j, k) == 0
+    prob = (p[i] * p[j] * p[k]
+            * tables[0][_equal_pairs(enc.league, i, j, k)]
+            * tables[1][_equal_pairs(enc.market, i, j, k)])
+    bi, bj, bk = np.nonzero(valid & (prob >= floor))
+
+    best_prob = np.concatenate([best[0], prob[bi, bj, bk]])
+    best_idx = np.concatenate([best[1], np.stack([first[bi], rest[bj], rest[bk]], axis=1)])
+    if best_prob.size > top_k:
+        keep = np.argpartition(-best_prob, top_k - 1)[:top_k]
+        best_prob, best_idx = best_prob[keep], best_idx[keep]
+    if best_prob.size == top_k:
+        floor = max(floor, best_prob.min())
+    return (best_prob, best_idx), floor
+
+
+def _ranked(legs, best_prob, best_idx) -> list:
+    order = np.lexsort((best_idx[:, 2], best_idx[:, 1], best_idx[:, 0], -best_prob))
+    return [
+        (float(best_prob[r]), tuple(legs[x] for x in best_idx[r]))
+        for r in order
+    ]
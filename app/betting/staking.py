@@ -0,0 +1,133 @@
+"""
+betting/staking.py
+------------------
+Simultaneous Kelly staking for overlapping accumulators.
+
+Per-set Kelly treats every set as an independent bet, but sets sharing
+legs win and lose together, so summing per-set stakes over-bets badly.
+Here the stakes f (fractions of bankroll) maximize expected log wealth
+jointly:
+
+    E[log(1 + sum_i f_i * (odds_i * won_i - 1))]
+
+over joint match outcomes. Legs of the same fixture are not independent
+coins (Over 1.5 / Over 2.5 are nested, Over 2.5 / Under 2.5 exclusive),
+so each outcome draws one score line per fixture from its Poisson model
+(home_xg, away_xg) and settles every leg on it with the
+models.markets.GOAL_MARKETS predicates. Two calibration coins then bring
+the model in line with the displayed numbers: one per leg (league
+reliability, market blend) and one per set (correlation and diversity
+factors), so a set wins with its own ``prob``. Coins only ever turn a win
+into a loss, which keeps exclusive legs exclusive; a leg or set priced
+above its score model is capped at the model. Legs without xG or a
+score-settled market fall back to an independent coin.
+
+A fixed-seed sample of outcomes is used, so stakes don't jitter between
+reruns. Each outcome is a row of an (outcomes x sets) return matrix, so
+the objective and its gradient are two matrix products. scipy's SLSQP
+solves the bounded problem in milliseconds.
+"""
+
+import numpy as np
+from scipy.optimize import minimize
+
+from betting.ids import leg_key
+from models.markets import GOAL_MARKETS
+
+SAMPLE_OUTCOMES = 20_000
+SAMPLE_SEED = 7
+
+# Fractional Kelly multiplier and cap on the total bankroll at risk
+KELLY_FRACTION = 0.5
+MAX_BANKROLL_FRACTION = 0.5
+
+
+def _settle(settles, home: np.ndarray, away: np.ndarray) -> np.ndarray:
+    """Apply a scalar score predicate to sampled score lines (once per distinct score)."""
+    scores, inverse = np.unique(np.stack([home, away], axis=1), axis=0, return_inverse=True)
+    return np.array([settles(h, a) for h, a in scores.tolist()], dtype=bool)[inverse.reshape(-1)]
+
+
+def _thin(won: np.ndarray, prob: float, rng) -> np.ndarray:
+    """Keep each win with probability prob / P(win), capped at 1."""
+    model = won.mean()
+    keep = min(1.0, prob / model) if model > 0 else 0.0
+    return won & (rng.random(won.shape[0]) < keep)
+
+
+def leg_outcomes(legs: list, samples: int = SAMPLE_OUTCOMES, seed: int = SAMPLE_SEED):
+    """
+    Sampled joint outcomes of ``legs`` (bet dicts with "prob", and
+    "home_xg" / "away_xg" for score-settled markets): ``(won, weight)`` with
+    ``won`` an (outcomes x legs) bool matrix and ``weight`` each row's
+    probability. Legs of one fixture are settled on the same score line.
+    """
+    rng = np.random.default_rng(seed)
+    won = np.empty((samples, len(legs)), dtype=bool)
+    score_lines = {}
+    for j, bet in enumerate(legs):
+        settles = GOAL_MARKETS.get(bet["market"])
+        if settles is None or bet.get("home_xg") is None or bet.get("away_xg") is None:
+            won[:, j] = rng.random(samples) < bet["prob"]
+            continue
+        fixture = leg_key(bet)[0]
+        if fixture not in score_lines:
+            score_lines[fixture] = (rng.poisson(float(bet["home_xg"]), samples),
+                                    rng.poisson(float(bet["away_xg"]), samples))
+        won[:, j] = _thin(_settle(settles, *score_lines[fixture]), bet["prob"], rng)
+    return won, np.full(samples, 1 / samples)
+
+
+def kelly_fractions(sets: list, fraction: float = KELLY_FRACTION,
+                    max_total: float = MAX_BANKROLL_FRACTION) -> np.ndarray:
+    """
+    Bankroll fraction to stake on each set (dicts with "bets", "prob" and
+    "odds"; legs as in ``leg_outcomes``), solved jointly. Sets without odds,
+    or with no edge, get 0.
+    """
+    fractions = np.zeros(len(sets))
+    priced = [i for i, s in enumerate(sets) if s.get("odds", 0) > 1]
+    if not priced:
+        return fractions
+
+    # Distinct legs and, per set, which of them it needs
+    legs = {}
+    for i in priced:
+        for b in sets[i]["bets"]:
+            legs.setdefault(leg_key(b), b)
+    index = {key: j for j, key in enumerate(legs)}
+    needs = np.zeros((len(priced), len(legs)), dtype=bool)
+    for row, i in enumerate(priced):
+        needs[row, [index[leg_key(b)] for b in sets[i]["bets"]]] = True
+
+    won, weight = leg_outcomes(list(legs.values()))
+    # A set wins in an outcome when none of its legs lost, then at its own prob
+    set_won = ~((~won).astype(np.int32) @ needs.T.astype(np.int32)).astype(bool)
+    rng = np.random.default_rng(SAMPLE_SEED + 1)
+    for row, i in enumerate(priced):
+        set_won[:, row] = _thin(set_won[:, row], sets[i].get("prob", 1.0), rng)
+    odds = np.array([sets[i]["odds"] for i in priced], dtype=float)
+    returns = np.where(set_won, odds - 1, -1.0)            # outcomes x sets
+
+    # Sets with no edge on their own can still hedge, but only if some set has one
+    if not (weight @ returns > 0).any():
+        return fractions
+
+    def objective(f):
+        wealth = 1 + returns @ f
+        return -weight @ np.log(wealth), -(weight / wealth) @ returns
+
+    result = minimize(
+        objective, np.zeros(len(priced)), jac=True, method="SLSQP",
+        bounds=[(0, max_total)] * len(priced),
+        constraints=[{"type": "ineq", "fun": lambda f: max_total - f.sum(),
+                      "jac": lambda f: -np.ones_like(f)}],
+    )
+    fractions[priced] = np.clip(result.x, 0, None) * fraction
+    return fractions
+
+
+def kelly_stakes(sets: list, bankroll: float, fraction: float = KELLY_FRACTION,
+                 max_total: float = MAX_BANKROLL_FRACTION) -> list:
+    """Stakes in bankroll currency (rounded to cents), one per set."""
+    return [round(float(f) * bankroll, 2) for f in kelly_fractions(sets, fraction, max_total)]
@@ -0,0 +1,151 @@
+"""
+betting/stream.py
+-----------------
+Lazy, best-first stream of bet sets for paginated UIs.
+
+The dashboards only ever show 10-30 sets, so instead of building and
+sorting hundreds up front, iter_sets() yields sets in descending
+probability order on demand from a heap-ordered frontier, and SetPager
+materializes only as far as the page being rendered.
+
+Frontier nodes are (fixtures, legs) pairs over fixtures ordered by their
+best leg: a node's children either move one fixture to the next one (only
+from nodes still on each fixture's best leg) or move one leg to the next
+market of its fixture. Every child is no more probable than its parent, so
+popping the heap gives sets in descending order, with no duplicates and no
+same-match combos.
+"""
+
+import heapq
+
+from betting.accumulators import MAX_LEGS, MIN_LEGS, group_by_match
+
+
+def iter_sets(bets: list, legs: int = 3, min_prob: float = 0.0,
+              adjust=None, max_adjust: float = 1.0):
+    """
+    Yield ``(prob, (leg, ...))`` for every ``legs``-leg set from different
+    matches with probability >= ``min_prob``, best first.
+
+    With ``adjust(combo, base_prob)`` the stream orders by adjusted
+    probability: a set is held back until no unexpanded node, even boosted
+    by ``max_adjust``, could still beat it.
+    """
+    if not MIN_LEGS <= legs <= MAX_LEGS:
+        raise ValueError(f"legs must be between {MIN_LEGS} and {MAX_LEGS}, got {legs}")
+    groups = group_by_match([b for b in bets if b["prob"] > 0])
+    n = len(groups)
+    if n < legs:
+        return
+
+    def base_prob(fixtures, choice):
+        prob = 1.0
+        for x, m in zip(fixtures, choice):
+            prob *= groups[x][m]["prob"]
+        return prob
+
+    root = (tuple(range(legs)), (0,) * legs)
+    frontier = [(-base_prob(*root), root)]
+    seen = {root}
+    ready = []                      # expanded sets waiting on the adjust bound
+
+    while frontier or ready:
+        bound = -frontier[0][0] * max_adjust if frontier else 0.0
+        if ready and -ready[0][0] >= bound:
+            prob, _, combo = heapq.heappop(ready)
+            yield -prob, combo
+            continue
+        if not frontier or bound < min_prob:
+            # Nothing left in the frontier can qualify; drain what is ready
+            while ready:
+                prob, _, combo = heapq.heappop(ready)
+                yield -prob, combo
+            return
+
+        neg_base, (fixtures, choice) = heapq.heappop(frontier)
+        combo = tuple(groups[x][m] for x, m in zip(fixtures, choice))
+        prob = adjust(combo, -neg_base) if adjust else -neg_base
+        if prob >= min_prob:
+            if adjust:
+                heapq.heappush(ready, (-prob, (fixtures, choice), combo))
+            else:
+                yield prob, combo
+
+        children = []
+        for j in range(legs):
+            # Next market within the same fixture
+            if choice[j] + 1 < len(groups[fixtures[j]]):
+                children.append((fixtures, choice[:j] + (choice[j] + 1,) + choice[j + 1:]))
+            # Next fixture, only while every leg is still its fixture's best market
+            if not any(choice):
+                nxt = fixtures[j] + 1
+                if nxt < n and (j + 1 == legs or nxt < fixtures[j + 1]):
+                    children.append((fixtures[:j] + (nxt,) + fixtures[j + 1:], choice))
+        for child in children:
+            if child not in seen:
+                seen.add(child)
+                heapq.heappush(frontier, (-base_prob(*child), child))
+
+
+class SetPager:
+    """
+    Materializes a set stream only as far as requested.
+
+    ``build(prob, combo)`` turns each streamed set into whatever the UI
+    renders (usually the set dict). Materialized sets are kept, so later
+    pages and reruns continue where the stream left off.
+    """
+
+    def __init__(self, stream, build=None):
+        self._stream = iter(stream)
+        self._build = build or (lambda prob, combo: {"bets": list(combo), "prob": prob})
+        self._items = []
+        self.exhausted = False
+
+    def __len__(self) -> int:
+        """Number of sets materialized so far (not the total available)."""
+        return len(self._items)
+
+    def _fill(self, count: int):
+        while len(self._items) < count and not self.exhausted:
+            try:
+                prob, combo = next(self._stream)
+            except StopIteration:
+                self.exhausted = True
+                break
+            self._items.append(self._build(prob, combo))
+
+    def take(self, count: int) -> list:
+        """The best ``count`` sets."""
+        self._fill(count)
+        return self._items[:count]
+
+    def page(self, number: int, size: int) -> list:
+        """Sets for page ``number`` (0-based) of ``size`` sets each."""
+        return self.take((number + 1) * size)[number * size:]
+
+    def in_range(self, low: float, high: float, offset: int = 0, count: int = 10,
+                 limit: int = None) -> list:
+        """
+        Up to ``count`` sets with low <= prob < high, skipping the first
+        ``offset`` of them. Stops pulling from the stream as soon as it
+        passes below ``low``, or after scanning the best ``limit`` sets.
+        """
+        found = []
+        skipped = 0
+        i = 0
+        while len(found) < count and (limit is None or i < limit):
+            self._fill(i + 1)
+            if i >= len(self._items):
+                break
+            item = self._items[i]
+            i += 1
+            if item["prob"] >= high:
+                continue
+            if item["prob"] < low:
+                break
+            if skipped < offset:
+                skipped += 1
+                continue
+            found.append(item)
+        return found
@@ -8,11 +8,15 @@ Fixed: No freezing, all filtering happens client-side in JavaScript
 import streamlit as st
 import pandas as pd
 import numpy as np
-import requests
 from datetime import date, timedelta, datetime
 from scipy.stats import poisson
-import itertools
-import time
+from betting.ids import dedupe_sets, merge_sets, set_id, stable_number
+from betting.legs import LegTable
+from betting.accumulators import top_k_sets
+from models.market_cache import cached_price_fixtures
+from utils.fetch import fetch_all
+from utils.history import get_match_history, sync_competitions
+from utils.http import get_session
 import json
 from pathlib import Path
 
@@ -40,6 +44,12 @@ ARCHIVE_DIR.mkdir(exist_ok=True)
 def save_sets_to_archive(sets: list, fixtures_date: str):
     """Save sets to archive for tracking."""
     archive_file = ARCHIVE_DIR / f"sets_{fixtures_date}.json"
+    # Same set -> same ID in every process, so re-saves merge instead of duplicating
+    if archive_file.exists():
+        with open(archive_file) as f:
+            sets = merge_sets(json.load(f).get("sets", []), sets)
+    else:
+        sets = dedupe_sets(sets)
     archive_data = {
         "date": fixtures_date,
         "generated_at": datetime.now().isoformat(),
@@ -54,34 +64,36 @@ def api_get(endpoint: str, params: dict = None) -> dict:
     if not API_KEY:
         return {}
     headers = {"X-Auth-Token": API_KEY}
+    # Cached on disk and rate-limited (10 req/min, shared by every session)
+    session = get_session("football-data")
     try:
-        resp = requests.get(f"{BASE_URL}/{endpoint}", headers=headers, params=params, timeout=15)
-        if resp.status_code == 429:
-            time.sleep(60)
-            resp = requests.get(f"{BASE_URL}/{endpoint}", headers=headers, params=params, timeout=15)
+        for _ in range(3):
+            resp = session.get(f"{BASE_URL}/{endpoint}", headers=headers, params=params, timeout=15)
+            if resp.status_code != 429:
+                break
         return resp.json() if resp.status_code == 200 else {}
     except:
         return {}
 
-def score_matrix(home_xg: float, away_xg: float, max_goals: int = 6) -> dict:
-    matrix = {}
-    for h in range(max_goals + 1):
-        for a in range(max_goals + 1):
-            matrix[(h, a)] = poisson.pmf(h, home_xg) * poisson.pmf(a, away_xg)
-    return matrix
-
-def calculate_diverse_markets(home_xg: float, away_xg: float) -> dict:
-    matrix = score_matrix(home_xg, away_xg)
+# Goal markets: "closed_form" (exact marginals) or "grid" (adaptive score grid)
+MARKET_PRICING = "closed_form"
+
+DIVERSE_GOAL_MARKETS = [
+    "Over 0.5 Goals", "Over 1.5 Goals", "Over 2.5 Goals",
+    "Under 2.5 Goals", "Under 3.5 Goals",
+    "BTTS", "BTTS & Over 2.5",
+]
+RESULT_MARKETS = ["Home Win", "Away Win", "Draw", "Double Chance 1X", "Double Chance X2"]
+
+def calculate_diverse_markets_batch(home_xg, away_xg) -> pd.DataFrame:
+    """All markets for N fixtures at once, one row per fixture."""
+    home_xg = np.asarray(home_xg, dtype=float)
+    away_xg = np.asarray(away_xg, dtype=float)
+    goal_names = DIVERSE_GOAL_MARKETS + RESULT_MARKETS
+    goal_probs = cached_price_fixtures(home_xg, away_xg, goal_names, mode=MARKET_PRICING)
+    goal_probs = dict(zip(goal_names, goal_probs.T))
     
-    markets = {
-        "Over 0.5 Goals": sum(p for (h, a), p in matrix.items() if h + a > 0),
-        "Over 1.5 Goals": sum(p for (h, a), p in matrix.items() if h + a > 1),
-        "Over 2.5 Goals": sum(p for (h, a), p in matrix.items() if h + a > 2),
-        "Under 2.5 Goals": sum(p for (h, a), p in matrix.items() if h + a < 3),
-        "Under 3.5 Goals": sum(p for (h, a), p in matrix.items() if h + a < 4),
-        "BTTS": sum(p for (h, a), p in matrix.items() if h >= 1 and a >= 1),
-        "BTTS & Over 2.5": sum(p for (h, a), p in matrix.items() if h >= 1 and a >= 1 and h + a > 2),
-    }
+    markets = {name: goal_probs[name] for name in DIVERSE_GOAL_MARKETS}
     
     total_xg = home_xg + away_xg
     avg_corners = 10 + (total_xg - 2.5) * 1.5
@@ -89,27 +101,27 @@ def calculate_diverse_markets(home_xg: float, away_xg: float) -> dict:
     markets["Over 10.5 Corners"] = 1 - poisson.cdf(10, avg_corners)
     markets["Under 11.5 Corners"] = poisson.cdf(11, avg_corners)
     
-    home_shots = max(3, home_xg * 3)
-    away_shots = max(3, away_xg * 3)
+    home_shots = np.maximum(3, home_xg * 3)
+    away_shots = np.maximum(3, away_xg * 3)
     total_shots = home_shots + away_shots
     markets["Over 10.5 Shots on Target"] = 1 - poisson.cdf(10, total_shots)
     markets["Over 12.5 Shots on Target"] = 1 - poisson.cdf(12, total_shots)
     
-    avg_fouls = 22 + abs(home_xg - away_xg) * 2
+    avg_fouls = 22 + np.abs(home_xg - away_xg) * 2
     markets["Over 24.5 Fouls"] = 1 - poisson.cdf(24, avg_fouls)
     markets["Under 26.5 Fouls"] = poisson.cdf(26, avg_fouls)
     
-    avg_cards = 3.5 + abs(home_xg - away_xg) * 0.5
+    avg_cards = 3.5 + np.abs(home_xg - away_xg) * 0.5
     markets["Over 3.5 Cards"] = 1 - poisson.cdf(3, avg_cards)
     markets["Under 5.5 Cards"] = poisson.cdf(5, avg_cards)
     
-    markets["Home Win"] = sum(p for (h, a), p in matrix.items() if h > a)
-    markets["Away Win"] = sum(p for (h, a), p in matrix.items() if h < a)
-    markets["Draw"] = sum(p for (h, a), p in matrix.items() if h == a)
-    markets["Double Chance 1X"] = sum(p for (h, a), p in matrix.items() if h >= a)
-    markets["Double Chance X2"] = sum(p for (h, a), p in matrix.items() if h <= a)
+    for name in RESULT_MARKETS:
+        markets[name] = goal_probs[name]
     
-    return markets
+    return pd.DataFrame(markets)
+
+def calculate_diverse_markets(home_xg: float, away_xg: float) -> dict:
+    return calculate_diverse_markets_batch([home_xg], [away_xg]).iloc[0].to_dict()
 
 @st.cache_data(ttl=1800, show_spinner=False)
 def get_all_fixtures() -> pd.DataFrame:
@@ -120,8 +132,12 @@ def get_all_fixtures() -> pd.DataFrame:
     tomorrow = (date.today() + timedelta(days=1)).strftime("%Y-%m-%d")
     all_fixtures = []
     
-    for league_name, comp_id in COMPETITIONS.items():
-        data = api_get(f"competitions/{comp_id}/matches", {"dateFrom": today, "dateTo": tomorrow})
+    # Every competition requested concurrently
+    responses = fetch_all(api_get, [
+        (f"competitions/{comp_id}/matches", {"dateFrom": today, "dateTo": tomorrow})
+        for comp_id in COMPETITIONS.values()
+    ])
+    for league_name, data in zip(COMPETITIONS, responses):
         for match in data.get("matches", []):
             if match.get("status") not in ["SCHEDULED", "TIMED"]:
                 continue
@@ -135,7 +151,6 @@ def get_all_fixtures() -> pd.DataFrame:
                 "league": league_name,
                 "fixture_id": match.get("id", 0),
             })
-        time.sleep(0.2)
     
     df = pd.DataFrame(all_fixtures)
     if df.empty:
@@ -143,10 +158,10 @@ def get_all_fixtures() -> pd.DataFrame:
     return df
 
 @st.cache_data(ttl=7200, show_spinner=False)
-def get_team_xg(team_id: int, home: bool = True) -> float:
-    data = api_get(f"teams/{team_id}/matches", {"status": "FINISHED", "limit": 10})
+def get_team_base_rate(team_id: int) -> float | None:
+    """Average goals over the last 10 finished matches; cached once per team, not per side."""
     goals_scored = []
-    for match in data.get("matches", []):
+    for match in get_match_history().team_form(team_id, api_get, limit=10):
         home_team = match.get("homeTeam", {})
         away_team = match.get("awayTeam", {})
         score = match.get("score", {}).get("fullTime", {})
@@ -159,9 +174,22 @@ def get_team_xg(team_id: int, home: bool = True) -> float:
             if goals is not None:
                 goals_scored.append(int(goals))
     if goals_scored:
-        return round(sum(goals_scored) / len(goals_scored) * (1.05 if home else 0.95), 2)
+        return sum(goals_scored) / len(goals_scored)
+    return None
+
+def team_xg(base: float | None, home: bool = True) -> float:
+    if base is not None:
+        return round(base * (1.05 if home else 0.95), 2)
     return 1.4 if home else 1.2
 
+def add_team_xg(fixtures: pd.DataFrame) -> pd.DataFrame:
+    """home_xg / away_xg from one base-rate lookup per distinct team in the frame."""
+    team_ids = sorted({int(t) for t in fixtures["home_id"]} | {int(t) for t in fixtures["away_id"]})
+    rates = dict(zip(team_ids, fetch_all(get_team_base_rate, team_ids)))
+    fixtures["home_xg"] = [team_xg(rates[int(t)], True) for t in fixtures["home_id"]]
+    fixtures["away_xg"] = [team_xg(rates[int(t)], False) for t in fixtures["away_id"]]
+    return fixtures
+
 def get_mock_fixtures() -> pd.DataFrame:
     data = [
         ("Arsenal", "Chelsea", 1.8, 1.4, "Premier League"),
@@ -181,17 +209,20 @@ def get_mock_fixtures() -> pd.DataFrame:
     for home, away, home_xg, away_xg, league in data:
         fixtures.append({
             "home": home, "away": away,
-            "home_id": hash(home) % 10000, "away_id": hash(away) % 10000,
+            "home_id": stable_number(home, 10000), "away_id": stable_number(away, 10000),
             "home_xg": home_xg, "away_xg": away_xg, "league": league,
-            "fixture_id": hash(f"{home}{away}") % 1000000,
+            "fixture_id": stable_number(f"{home}{away}", 1000000),
         })
     return pd.DataFrame(fixtures)
 
-def generate_all_flashcards(fixtures: pd.DataFrame) -> list:
-    """Generate ALL bet sets across all probability ranges (let JS filter)."""
+def generate_all_flashcards(fixtures: pd.DataFrame, legs: int = 3):
+    """
+    Generate ALL bet sets across all probability ranges (let JS filter).
+    Returns the compact ``(LegTable, [(prob, leg_indices), ...])`` form.
+    """
     all_bets = []
-    for _, row in fixtures.iterrows():
-        markets = calculate_diverse_markets(row["home_xg"], row["away_xg"])
+    market_table = calculate_diverse_markets_batch(fixtures["home_xg"], fixtures["away_xg"])
+    for (_, row), (_, markets) in zip(fixtures.iterrows(), market_table.iterrows()):
         match_name = f"{row['home']} vs {row['away']}"
         
         for market, prob in markets.items():
@@ -204,32 +235,26 @@ def generate_all_flashcards(fixtures: pd.DataFrame) -> list:
                     "league": row["league"]
                 })
     
-    if len(all_bets) < 3:
-        return []
+    table = LegTable.from_bets(all_bets)
+    if len(table) < legs:
+        return table, []
     
-    # Generate ALL combinations (JS will filter by range)
+    # Top sets across all ranges (JS will filter by range)
+    sets = LegTable.compact(top_k_sets(table.legs, 200, 0.40, legs=legs))
+    return table, sets
+
+def flashcard_dicts(table: LegTable, sets: list) -> list:
+    """Materialize set dicts for the archive and JSON export."""
     results = []
-    for combo in itertools.combinations(all_bets, 3):
-        if len({b["match"] for b in combo}) < 3:
-            continue
-        
-        combined = combo[0]["prob"] * combo[1]["prob"] * combo[2]["prob"]
-        
-        # Include if >= 40% (JS handles upper bounds)
-        if combined >= 0.40:
-            results.append({
-                "bets": list(combo), 
-                "prob": combined,
-                "set_id": hash(str(combo)) % 1000000,
-            })
-        
-        if len(results) >= 200:  # Generate more sets for all ranges
-            break
-    
-    return sorted(results, key=lambda x: x["prob"], reverse=True)
+    for prob, indices in sets:
+        card = table.set_dict(prob, indices)
+        card["set_id"] = set_id(card["bets"])
+        results.append(card)
+    return results
 
 # Load data
 use_mock = st.sidebar.checkbox("📊 Use Mock Data", value=not bool(API_KEY))
+set_legs = st.sidebar.selectbox("🧩 Legs per set", [2, 3, 4, 5], index=1)
 
 with st.spinner("Loading fixtures..."):
     if use_mock:
@@ -238,13 +263,13 @@ with st.spinner("Loading fixtures..."):
         all_fixtures = get_all_fixtures()
         if "home_xg" not in all_fixtures.columns:
             with st.spinner("Calculating xG..."):
-                all_fixtures["home_xg"] = all_fixtures["home_id"].apply(lambda x: get_team_xg(x, True))
-                all_fixtures["away_xg"] = all_fixtures["away_id"].apply(lambda x: get_team_xg(x, False))
+                sync_competitions(api_get, COMPETITIONS.values())
+                add_team_xg(all_fixtures)
 
 league_counts = all_fixtures['league'].value_counts().to_dict()
 
 # Generate ALL flashcards once (JavaScript will filter by range)
-all_flashcards = generate_all_flashcards(all_fixtures)
+leg_table, all_sets = generate_all_flashcards(all_fixtures, set_legs)
 
 # Download button in sidebar
 st.sidebar.markdown("---")
@@ -252,6 +277,7 @@ st.sidebar.subheader("💾 Save Today's Sets")
 
 if st.sidebar.button("Save & Download", use_container_width=True):
     today_str = date.today().strftime("%Y-%m-%d")
+    all_flashcards = flashcard_dicts(leg_table, all_sets)
     save_sets_to_archive(all_flashcards, today_str)
     
     st.sidebar.download_button(
@@ -268,7 +294,7 @@ st.sidebar.markdown("---")
 if st.sidebar.button("📊 Auto-Check Results", use_container_width=True):
     st.switch_page("pages/auto_check.py")
 
-flashcards_json = json.dumps(all_flashcards)
+flashcards_json = json.dumps(leg_table.payload(all_sets))
 league_counts_json = json.dumps(league_counts)
 all_leagues_json = json.dumps(list(league_counts.keys()))
 
@@ -775,12 +801,25 @@ body::before {{
 </div>
 
 <script>
-let allFlashcards = {flashcards_json};
+let allFlashcards = expandFlashcards({flashcards_json});
 let leagueCounts = {league_counts_json};
 let selectedLeagues = {all_leagues_json};
 let currentMin = 0.40;
 let currentMax = 0.50;
 
+// Sets arrive as leg indices into shared leg columns; expand to card objects once
+function expandFlashcards(payload) {{
+  const cats = payload.categories;
+  const cols = payload.legs;
+  const legs = cols.prob.map((prob, i) => ({{
+    match: cats.match[cols.match[i]],
+    market: cats.market[cols.market[i]],
+    league: cats.league[cols.league[i]],
+    prob: prob
+  }}));
+  return payload.sets.map(([prob, indices]) => ({{ prob: prob, bets: indices.map(i => legs[i]) }}));
+}}
+
 document.addEventListener('DOMContentLoaded', () => {{
   renderLeagues();
   renderFlashcards();
@@ -14,11 +14,19 @@ Advanced features:
 import streamlit as st
 import pandas as pd
 import numpy as np
-import requests
 from datetime import date, timedelta, datetime
-from scipy.stats import poisson
-import itertools
-import time
+from betting.accumulators import top_k_sets
+from betting.ids import dedupe_sets, merge_sets, set_id, stable_number
+from betting.incremental import IncrementalSets
+from betting.portfolio import select_portfolio
+from betting.scoring import top_k_scored_triples
+from betting.staking import kelly_stakes
+from models.form import elite_xg_table
+from models.market_cache import MARKET_CACHE, cached_price_fixtures
+from models.odds import blend_bets, load_odds_file, odds_frame
+from utils.fetch import fetch_all
+from utils.history import get_match_history, sync_competitions
+from utils.http import get_session
 import json
 from pathlib import Path
 
@@ -70,243 +78,204 @@ MIN_SET_PROB = 0.50  # 50% minimum
 # Maximum sets to generate (quality over quantity)
 MAX_SETS = 15
 
+# Candidate pool the diversified selector picks MAX_SETS from
+CANDIDATE_SETS = 2000
+
+# Portfolio diversity: a leg backs at most this many sets, and each
+# already-selected set sharing a leg costs this much of a set's value
+MAX_LEG_EXPOSURE = 3
+OVERLAP_PENALTY = 0.1
+
+# Legs per set (2 = doubles ... 5 = 5-folds)
+SET_LEGS = 3
+
+# Market pricing: "closed_form" (exact marginals) or "grid" (adaptive score grid)
+MARKET_PRICING = "closed_form"
+
+# Bookmaker odds feed (fixture_id, market, bookmaker, odds) blended into the model
+ODDS_FEED = Path("odds_feed.csv")
+
 # ══════════════════════════════════════════════════════════════════════════════
 # ADVANCED XG CALCULATION
 # ══════════════════════════════════════════════════════════════════════════════
 
-def calculate_elite_xg(team_id: int, home: bool, opponent_id: int = None) -> float:
+def calculate_elite_xg_batch(fixtures: pd.DataFrame) -> pd.DataFrame:
     """
-    Elite xG calculation with multiple factors:
+    Elite xG for every fixture with multiple factors:
     1. Weighted recent form (last 10 matches)
     2. Form trend detection
     3. Home/away split
     4. Head-to-head adjustment (if opponent known)
     5. Quality of opposition adjustment
-    """
-    data = api_get(f"teams/{team_id}/matches", {"status": "FINISHED", "limit": 15})
-    
-    if not data or not data.get("matches"):
-        return 1.4 if home else 1.2
-    
-    matches = data.get("matches", [])
-    
-    # Separate home and away matches for better accuracy
-    home_goals = []
-    away_goals = []
-    h2h_goals = []  # Goals against specific opponent
-    
-    for match in matches:
-        home_team = match.get("homeTeam", {})
-        away_team = match.get("awayTeam", {})
-        score = match.get("score", {}).get("fullTime", {})
-        
-        is_home_match = home_team.get("id") == team_id
-        is_away_match = away_team.get("id") == team_id
-        
-        # Check if this is H2H match
-        is_h2h = False
-        if opponent_id:
-            opponent_in_match = (home_team.get("id") == opponent_id or 
-                                away_team.get("id") == opponent_id)
-            is_h2h = opponent_in_match
-        
-        if is_home_match:
-            goals = score.get("home")
-            if goals is not None:
-                home_goals.append(int(goals))
-                if is_h2h:
-                    h2h_goals.append(int(goals))
-        elif is_away_match:
-            goals = score.get("away")
-            if goals is not None:
-                away_goals.append(int(goals))
-                if is_h2h:
-                    h2h_goals.append(int(goals))
-    
-    # Decide which dataset to use
-    if home:
-        relevant_goals = home_goals if home_goals else away_goals
-    else:
-        relevant_goals = away_goals if away_goals else home_goals
-    
-    if not relevant_goals:
-        return 1.4 if home else 1.2
     
-    # WEIGHTED AVERAGE (exponential decay)
-    weights = [0.30, 0.25, 0.20, 0.15, 0.10, 0.05, 0.03, 0.02, 0.01, 0.01]
-    available_goals = relevant_goals[:len(weights)]
-    available_weights = weights[:len(available_goals)]
-    
-    weight_sum = sum(available_weights)
-    normalized_weights = [w / weight_sum for w in available_weights]
-    
-    weighted_avg = sum(g * w for g, w in zip(available_goals, normalized_weights))
-    
-    # FORM TREND MULTIPLIER
-    form_multiplier = 1.0
-    if len(available_goals) >= 5:
-        recent_avg = sum(available_goals[:3]) / 3
-        older_avg = sum(available_goals[3:6]) / max(1, len(available_goals[3:6]))
-        
-        if recent_avg > older_avg * 1.4:  # Hot streak
-            form_multiplier = 1.15
-        elif recent_avg > older_avg * 1.2:
-            form_multiplier = 1.10
-        elif recent_avg > older_avg * 1.1:
-            form_multiplier = 1.05
-        elif recent_avg < older_avg * 0.6:  # Cold streak
-            form_multiplier = 0.85
-        elif recent_avg < older_avg * 0.8:
-            form_multiplier = 0.90
-        elif recent_avg < older_avg * 0.9:
-            form_multiplier = 0.95
-    
-    # HEAD-TO-HEAD ADJUSTMENT (strongest signal)
-    h2h_multiplier = 1.0
-    if len(h2h_goals) >= 3:
-        h2h_avg = sum(h2h_goals) / len(h2h_goals)
-        if h2h_avg > weighted_avg * 1.3:
-            h2h_multiplier = 1.20  # Always score well vs this opponent
-        elif h2h_avg < weighted_avg * 0.7:
-            h2h_multiplier = 0.80  # Struggle vs this opponent
-    
-    # HOME/AWAY ADVANTAGE
-    location_multiplier = 1.08 if home else 0.92
+    Season results are pulled once per competition (incrementally, into the
+    local match-history store) and the form of every team is computed in one
+    vectorized pass (models.form) - instead of one request per team.
+    """
+    sync_competitions(api_get, ELITE_COMPETITIONS.values())
+    history = get_match_history()
+    team_ids = sorted(set(fixtures["home_id"]) | set(fixtures["away_id"]))
     
-    # FINAL CALCULATION
-    final_xg = weighted_avg * form_multiplier * h2h_multiplier * location_multiplier
+    # Teams the competitions don't cover well (e.g. cup opponents): one top-up each
+    fetch_all(lambda team_id: history.team_form(int(team_id), api_get), team_ids)
     
-    return round(final_xg, 2)
+    return elite_xg_table(history.frame(team_ids), fixtures)
 
 # ══════════════════════════════════════════════════════════════════════════════
 # CONSERVATIVE MARKET CALCULATION
 # ══════════════════════════════════════════════════════════════════════════════
 
-def score_matrix(home_xg: float, away_xg: float, max_goals: int = 6) -> dict:
-    matrix = {}
-    for h in range(max_goals + 1):
-        for a in range(max_goals + 1):
-            matrix[(h, a)] = poisson.pmf(h, home_xg) * poisson.pmf(a, away_xg)
-    return matrix
+def calculate_conservative_markets_batch(home_xg, away_xg, leagues) -> np.ndarray:
+    """
+    Price the RELIABLE markets for every fixture in one pass.
+    Returns an N x len(RELIABLE_MARKETS) array, league-calibrated.
+    """
+    probs = cached_price_fixtures(home_xg, away_xg, RELIABLE_MARKETS, mode=MARKET_PRICING)
+    
+    # Conservative adjustment: reduce all probabilities by league factor
+    league_factors = np.array([LEAGUE_RELIABILITY.get(l, 0.85) for l in leagues])
+    return probs * league_factors[:, None]
 
 def calculate_conservative_markets(home_xg: float, away_xg: float, league: str) -> dict:
     """
     Only calculate RELIABLE markets.
     Apply league-specific calibration.
     """
-    matrix = score_matrix(home_xg, away_xg)
-    
-    markets = {
-        "Over 1.5 Goals": sum(p for (h, a), p in matrix.items() if h + a > 1),
-        "Over 2.5 Goals": sum(p for (h, a), p in matrix.items() if h + a > 2),
-        "Under 2.5 Goals": sum(p for (h, a), p in matrix.items() if h + a < 3),
-        "BTTS Yes": sum(p for (h, a), p in matrix.items() if h >= 1 and a >= 1),
-    }
-    
-    # Apply league reliability calibration
-    league_factor = LEAGUE_RELIABILITY.get(league, 0.85)
-    
-    # Conservative adjustment: reduce all probabilities by league factor
-    calibrated_markets = {}
-    for market, prob in markets.items():
-        # Apply calibration to be more conservative
-        calibrated_prob = prob * league_factor
-        calibrated_markets[market] = calibrated_prob
-    
-    return calibrated_markets
+    probs = calculate_conservative_markets_batch([home_xg], [away_xg], [league])[0]
+    return dict(zip(RELIABLE_MARKETS, probs))
 
 # ══════════════════════════════════════════════════════════════════════════════
 # CORRELATION-AWARE SET GENERATION
 # ══════════════════════════════════════════════════════════════════════════════
 
-def generate_elite_sets(fixtures: pd.DataFrame) -> list:
+# Largest factor set_adjustment() can apply (all-different markets bonus)
+MAX_SET_ADJUSTMENT = 1.02
+
+def set_adjustment(combo) -> float:
+    """Correlation penalty x market diversity bonus for a bet set."""
+    legs = len(combo)
+    
+    # RULE 2: Apply correlation penalty for same league
+    leagues = [b["league"] for b in combo]
+    same_league_count = max(leagues.count(l) for l in set(leagues))
+    
+    if same_league_count == legs:
+        correlation_penalty = 0.95  # All same league
+    elif same_league_count >= 2:
+        correlation_penalty = 0.98  # Some same league
+    else:
+        correlation_penalty = 1.0   # All different
+    
+    # RULE 3: Apply market diversity bonus
+    unique_markets = len({b["market"] for b in combo})
+    
+    if unique_markets == legs:
+        diversity_bonus = 1.02  # All different markets
+    elif unique_markets > 1:
+        diversity_bonus = 1.0
+    else:
+        diversity_bonus = 0.97  # All same market type
+    
+    return correlation_penalty * diversity_bonus
+
+def new_elite_set_state() -> IncrementalSets:
+    """Empty incremental set state configured with the elite rules."""
+    return IncrementalSets(
+        CANDIDATE_SETS, MIN_SET_PROB, legs=SET_LEGS,
+        adjust=lambda combo, base: base * set_adjustment(combo),
+        max_adjust=MAX_SET_ADJUSTMENT,
+        # RULES 2-3 as integer ops over encoded legs, scored in broadcast blocks
+        triples=top_k_scored_triples if SET_LEGS == 3 else None,
+    )
+
+def generate_elite_sets(fixtures: pd.DataFrame, state: IncrementalSets = None,
+                        odds: pd.DataFrame = None) -> list:
     """
     Generate only HIGH-QUALITY bet sets with:
     - No correlation (different matches only)
     - Only reliable markets
     - Conservative probability thresholds
     - Maximum diversity
+    - Capped exposure: MAX_SETS are picked from CANDIDATE_SETS by
+      betting.portfolio.select_portfolio, not straight off the top
+    
+    With a ``state`` (see new_elite_set_state), only combinations touching
+    fixtures whose bets changed since the last call are re-evaluated.
+    With ``odds`` (a models.odds table), leg probabilities are blended with
+    de-vigged bookmaker prices before any threshold is applied.
     """
     all_bets = []
     
-    for _, row in fixtures.iterrows():
-        markets = calculate_conservative_markets(
-            row["home_xg"], 
-            row["away_xg"],
-            row["league"]
-        )
-        
+    # All fixtures priced in a single matrix product
+    market_probs = calculate_conservative_markets_batch(
+        fixtures["home_xg"].to_numpy(dtype=float),
+        fixtures["away_xg"].to_numpy(dtype=float),
+        fixtures["league"].tolist(),
+    )
+    
+    for (_, row), probs in zip(fixtures.iterrows(), market_probs):
         match_name = f"{row['home']} vs {row['away']}"
         
-        for market, prob in markets.items():
-            # Only include bets above minimum threshold
-            if prob >= MIN_SINGLE_BET_PROB:
-                all_bets.append({
-                    "match": match_name,
-                    "match_id": str(row.get("fixture_id", "")),
-                    "market": market,
-                    "prob": min(prob, 0.98),  # Cap at 98%
-                    "league": row["league"],
-                    "home": row["home"],
-                    "away": row["away"],
-                })
+        for market, prob in zip(RELIABLE_MARKETS, probs):
+            all_bets.append({
+                "match": match_name,
+                "match_id": str(row.get("fixture_id", "")),
+                "market": market,
+                "prob": prob,
+                "league": row["league"],
+                "home": row["home"],
+                "away": row["away"],
+                # Score model, so the stakes can settle same-fixture legs jointly
+                "home_xg": float(row["home_xg"]),
+                "away_xg": float(row["away_xg"]),
+            })
     
-    if len(all_bets) < 3:
+    # Market blend (one vectorized pass), then only bets above minimum threshold
+    blend_bets(all_bets, odds)
+    all_bets = [b for b in all_bets if b["prob"] >= MIN_SINGLE_BET_PROB]
+    for bet in all_bets:
+        bet["prob"] = min(bet["prob"], 0.98)  # Cap at 98%
+    
+    if state is not None:
+        state.sync(all_bets)
+    elif len(all_bets) < SET_LEGS:
         return []
     
-    # Generate 3-bet combinations with STRICT rules
-    results = []
+    # Generate SET_LEGS-bet combinations with STRICT rules
+    # RULE 1 (all DIFFERENT matches) is enforced by the search itself;
+    # RULE 4 (minimum combined threshold) is its probability floor.
+    if state is not None:
+        top_sets = state.top()
+    elif SET_LEGS == 3:
+        # RULES 2-3 as integer ops over encoded legs, scored in broadcast blocks
+        top_sets = top_k_scored_triples(all_bets, CANDIDATE_SETS, MIN_SET_PROB)
+    else:
+        top_sets = top_k_sets(
+            all_bets, CANDIDATE_SETS, MIN_SET_PROB, legs=SET_LEGS,
+            adjust=lambda combo, base: base * set_adjustment(combo),
+            max_adjust=MAX_SET_ADJUSTMENT,
+        )
     
-    for combo in itertools.combinations(all_bets, 3):
-        # RULE 1: Must be from 3 DIFFERENT matches
-        matches = {b["match"] for b in combo}
-        if len(matches) < 3:
-            continue
-        
-        # RULE 2: Apply correlation penalty for same league
-        leagues = [b["league"] for b in combo]
-        same_league_count = max(leagues.count(l) for l in set(leagues))
-        
-        if same_league_count == 3:
-            correlation_penalty = 0.95  # All same league
-        elif same_league_count == 2:
-            correlation_penalty = 0.98  # Two same league
-        else:
-            correlation_penalty = 1.0   # All different
-        
-        # RULE 3: Apply market diversity bonus
-        markets = [b["market"] for b in combo]
-        unique_markets = len(set(markets))
-        
-        if unique_markets == 3:
-            diversity_bonus = 1.02  # All different markets
-        elif unique_markets == 2:
-            diversity_bonus = 1.0
-        else:
-            diversity_bonus = 0.97  # All same market type
-        
-        # Calculate TRUE combined probability
-        base_combined = combo[0]["prob"] * combo[1]["prob"] * combo[2]["prob"]
-        adjusted_combined = base_combined * correlation_penalty * diversity_bonus
-        
-        # RULE 4: Only include sets above minimum combined threshold
-        if adjusted_combined >= MIN_SET_PROB:
-            results.append({
-                "bets": list(combo),
-                "prob": adjusted_combined,
-                "set_id": hash(str(combo)) % 1000000,
-                "diversity_score": unique_markets,
-            })
-        
-        # Limit candidates to avoid long computation
-        if len(results) >= 200:
-            break
+    candidates = [
+        {
+            "bets": list(combo),
+            "prob": prob,
+            "set_id": set_id(combo),
+            "diversity_score": len({b["market"] for b in combo}),
+            # Accumulator price, only when every leg has a bookmaker price
+            **({"odds": round(float(np.prod([b["odds"] for b in combo])), 3)}
+               if all("odds" in b for b in combo) else {}),
+        }
+        for prob, combo in top_sets
+    ]
+    
+    # RULE 5: spread exposure - no leg carries more than MAX_LEG_EXPOSURE sets
+    results = select_portfolio(candidates, MAX_SETS, MAX_LEG_EXPOSURE, OVERLAP_PENALTY)
     
     # Sort by probability and diversity
     results.sort(key=lambda x: (x["prob"], x["diversity_score"]), reverse=True)
     
-    # Return only top sets
-    return results[:MAX_SETS]
+    return results
 
 # ══════════════════════════════════════════════════════════════════════════════
 # API & DATA FUNCTIONS
@@ -314,6 +283,12 @@ def generate_elite_sets(fixtures: pd.DataFrame) -> list:
 
 def save_sets_to_archive(sets: list, fixtures_date: str):
     archive_file = ARCHIVE_DIR / f"sets_{fixtures_date}.json"
+    # Same set -> same ID in every process, so re-saves merge instead of duplicating
+    if archive_file.exists():
+        with open(archive_file) as f:
+            sets = merge_sets(json.load(f).get("sets", []), sets)
+    else:
+        sets = dedupe_sets(sets)
     archive_data = {
         "date": fixtures_date,
         "generated_at": datetime.now().isoformat(),
@@ -328,11 +303,13 @@ def api_get(endpoint: str, params: dict = None) -> dict:
     if not API_KEY:
         return {}
     headers = {"X-Auth-Token": API_KEY}
+    # Cached on disk and rate-limited (10 req/min, shared by every session)
+    session = get_session("football-data")
     try:
-        resp = requests.get(f"{BASE_URL}/{endpoint}", headers=headers, params=params, timeout=15)
-        if resp.status_code == 429:
-            time.sleep(60)
-            resp = requests.get(f"{BASE_URL}/{endpoint}", headers=headers, params=params, timeout=15)
+        for _ in range(3):
+            resp = session.get(f"{BASE_URL}/{endpoint}", headers=headers, params=params, timeout=15)
+            if resp.status_code != 429:
+                break
         return resp.json() if resp.status_code == 200 else {}
     except:
         return {}
@@ -346,8 +323,12 @@ def get_elite_fixtures(target_date: date) -> pd.DataFrame:
     next_date_str = (target_date + timedelta(days=1)).strftime("%Y-%m-%d")
     all_fixtures = []
     
-    for league_name, comp_id in ELITE_COMPETITIONS.items():
-        data = api_get(f"competitions/{comp_id}/matches", {"dateFrom": date_str, "dateTo": next_date_str})
+    # Every competition requested concurrently
+    responses = fetch_all(api_get, [
+        (f"competitions/{comp_id}/matches", {"dateFrom": date_str, "dateTo": next_date_str})
+        for comp_id in ELITE_COMPETITIONS.values()
+    ])
+    for league_name, data in zip(ELITE_COMPETITIONS, responses):
         for match in data.get("matches", []):
             if match.get("status") not in ["SCHEDULED", "TIMED", "FINISHED"]:
                 continue
@@ -364,7 +345,6 @@ def get_elite_fixtures(target_date: date) -> pd.DataFrame:
                 "fixture_id": match.get("id", 0),
                 "status": match.get("status", "SCHEDULED"),
             })
-        time.sleep(0.2)
     
     df = pd.DataFrame(all_fixtures)
     if df.empty:
@@ -396,9 +376,9 @@ def get_mock_fixtures() -> pd.DataFrame:
     for home, away, home_xg, away_xg, league in data:
         fixtures.append({
             "home": home, "away": away,
-            "home_id": hash(home) % 10000, "away_id": hash(away) % 10000,
+            "home_id": stable_number(home, 10000), "away_id": stable_number(away, 10000),
             "home_xg": home_xg, "away_xg": away_xg, "league": league,
-            "fixture_id": hash(f"{home}{away}") % 1000000,
+            "fixture_id": stable_number(f"{home}{away}", 1000000),
         })
     return pd.DataFrame(fixtures)
 
@@ -466,24 +446,36 @@ with st.spinner("Loading elite fixtures..."):
         
         if not all_fixtures.empty and "home_xg" not in all_fixtures.columns:
             with st.spinner("Calculating elite xG..."):
-                xg_data = []
-                for _, row in all_fixtures.iterrows():
-                    home_xg = calculate_elite_xg(row["home_id"], True, row["away_id"])
-                    away_xg = calculate_elite_xg(row["away_id"], False, row["home_id"])
-                    xg_data.append({"home_xg": home_xg, "away_xg": away_xg})
-                
-                xg_df = pd.DataFrame(xg_data)
+                xg_df = calculate_elite_xg_batch(all_fixtures)
                 all_fixtures = pd.concat([all_fixtures, xg_df], axis=1)
 
 if all_fixtures.empty:
     st.warning("No fixtures available")
     st.stop()
 
-# Generate elite sets
-elite_sets = generate_elite_sets(all_fixtures)
+# Generate elite sets — state persists across reruns, so only changed fixtures are re-evaluated
+set_state_key = f"elite_set_state_{current_date.isoformat()}_{'mock' if use_mock else 'live'}"
+if set_state_key not in st.session_state:
+    st.session_state[set_state_key] = new_elite_set_state()
+odds_upload = st.sidebar.file_uploader("📈 Odds feed (CSV)", type=["csv"])
+try:
+    odds_table = odds_frame(pd.read_csv(odds_upload)) if odds_upload else load_odds_file(ODDS_FEED)
+except ValueError as e:
+    st.error(f"❌ Odds feed ignored: {e}")
+    odds_table = odds_frame([])
+elite_sets = generate_elite_sets(all_fixtures, st.session_state[set_state_key], odds_table)
 
 st.success(f"✅ {len(all_fixtures)} fixtures analyzed → {len(elite_sets)} ELITE sets generated")
 
+# Joint (simultaneous) Kelly stakes - only sets with bookmaker odds can be staked
+bankroll = st.sidebar.number_input("💰 Bankroll", min_value=0.0, value=100.0, step=10.0)
+for card, stake in zip(elite_sets, kelly_stakes(elite_sets, bankroll)):
+    card["stake"] = stake
+
+cache_stats = MARKET_CACHE.stats()
+st.sidebar.caption(f"🧮 Market cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                   f"({cache_stats['entries']} xG pairs)")
+
 # Download
 st.sidebar.markdown("---")
 if st.sidebar.button("💾 Save & Download", use_container_width=True):
@@ -509,10 +501,10 @@ else:
         with st.expander(f"🎯 ELITE SET #{i} — {card['prob']*100:.1f}% probability", expanded=i<=3):
             # Show diversity score
             diversity = card.get("diversity_score", 0)
-            if diversity == 3:
-                st.success("🌟 Maximum Diversity (3 different markets)")
-            elif diversity == 2:
-                st.info("✓ Good Diversity (2 different markets)")
+            if diversity == len(card["bets"]):
+                st.success(f"🌟 Maximum Diversity ({diversity} different markets)")
+            elif diversity >= 2:
+                st.info(f"✓ Good Diversity ({diversity} different markets)")
             
             # Show bets
             for j, bet in enumerate(card["bets"], 1):
@@ -526,4 +518,6 @@ else:
             
             # Expected value info
             implied_odds = round(1 / card['prob'], 2)
-            st.caption(f"💰 Implied odds: {implied_odds} | 📊 Diversity: {diversity}/3")
+            st.caption(f"💰 Implied odds: {implied_odds} | 📊 Diversity: {diversity}/{len(card['bets'])}")
+            if card.get("odds"):
+                st.caption(f"🎯 Odds: {card['odds']:.2f} | Kelly stake: {card['stake']:.2f}")
@@ -13,11 +13,15 @@ Features:
 import streamlit as st
 import pandas as pd
 import numpy as np
-import requests
 from datetime import date, timedelta, datetime
 from scipy.stats import poisson
-import itertools
-import time
+from betting.ids import set_id, stable_number
+from betting.legs import LegTable
+from betting.stream import SetPager, iter_sets
+from models.market_cache import cached_price_fixtures
+from utils.fetch import fetch_all
+from utils.history import get_match_history, sync_competitions
+from utils.http import get_session
 import json
 import io
 
@@ -112,59 +116,62 @@ def api_get(endpoint: str, params: dict = None) -> dict:
     if not API_KEY:
         return {}
     headers = {"X-Auth-Token": API_KEY}
+    # Cached on disk and rate-limited (10 req/min, shared by every session)
+    session = get_session("football-data")
     try:
-        resp = requests.get(f"{BASE_URL}/{endpoint}", headers=headers, params=params, timeout=15)
-        if resp.status_code == 429:
-            time.sleep(60)
-            resp = requests.get(f"{BASE_URL}/{endpoint}", headers=headers, params=params, timeout=15)
+        for _ in range(3):
+            resp = session.get(f"{BASE_URL}/{endpoint}", headers=headers, params=params, timeout=15)
+            if resp.status_code != 429:
+                break
         return resp.json() if resp.status_code == 200 else {}
     except:
         return {}
 
-def score_matrix(home_xg: float, away_xg: float, max_goals: int = 6) -> dict:
-    matrix = {}
-    for h in range(max_goals + 1):
-        for a in range(max_goals + 1):
-            matrix[(h, a)] = poisson.pmf(h, home_xg) * poisson.pmf(a, away_xg)
-    return matrix
+# Goal markets: "closed_form" (exact marginals) or "grid" (adaptive score grid)
+MARKET_PRICING = "closed_form"
 
-def calculate_diverse_markets(home_xg: float, away_xg: float) -> dict:
-    matrix = score_matrix(home_xg, away_xg)
+DIVERSE_GOAL_MARKETS = [
+    "Over 0.5 Goals", "Over 1.5 Goals", "Over 2.5 Goals",
+    "Under 2.5 Goals", "Under 3.5 Goals",
+    "BTTS Yes", "BTTS No", "BTTS & Over 2.5",
+]
+RESULT_MARKETS = ["Home Win", "Away Win", "Draw"]
+
+def calculate_diverse_markets_batch(home_xg, away_xg) -> pd.DataFrame:
+    """All markets for N fixtures at once, one row per fixture."""
+    home_xg = np.asarray(home_xg, dtype=float)
+    away_xg = np.asarray(away_xg, dtype=float)
+    goal_names = DIVERSE_GOAL_MARKETS + RESULT_MARKETS
+    goal_probs = cached_price_fixtures(home_xg, away_xg, goal_names, mode=MARKET_PRICING)
+    goal_probs = dict(zip(goal_names, goal_probs.T))
     total_xg = home_xg + away_xg
     
-    markets = {
-        "Over 0.5 Goals": sum(p for (h, a), p in matrix.items() if h + a > 0),
-        "Over 1.5 Goals": sum(p for (h, a), p in matrix.items() if h + a > 1),
-        "Over 2.5 Goals": sum(p for (h, a), p in matrix.items() if h + a > 2),
-        "Under 2.5 Goals": sum(p for (h, a), p in matrix.items() if h + a < 3),
-        "Under 3.5 Goals": sum(p for (h, a), p in matrix.items() if h + a < 4),
-        "BTTS Yes": sum(p for (h, a), p in matrix.items() if h >= 1 and a >= 1),
-        "BTTS No": sum(p for (h, a), p in matrix.items() if h == 0 or a == 0),
-        "BTTS & Over 2.5": sum(p for (h, a), p in matrix.items() if h >= 1 and a >= 1 and h + a > 2),
-    }
+    markets = {name: goal_probs[name] for name in DIVERSE_GOAL_MARKETS}
     
     avg_corners = 10 + (total_xg - 2.5) * 1.8
     markets["Over 9.5 Corners"] = 1 - poisson.cdf(9, avg_corners)
     markets["Over 10.5 Corners"] = 1 - poisson.cdf(10, avg_corners)
     markets["Under 11.5 Corners"] = poisson.cdf(11, avg_corners)
     
-    total_shots = max(3, home_xg * 3.5) + max(3, away_xg * 3.5)
+    total_shots = np.maximum(3, home_xg * 3.5) + np.maximum(3, away_xg * 3.5)
     markets["Over 10.5 Shots on Target"] = 1 - poisson.cdf(10, total_shots)
     markets["Over 12.5 Shots on Target"] = 1 - poisson.cdf(12, total_shots)
     
-    avg_fouls = 22 + abs(home_xg - away_xg) * 2.5
+    avg_fouls = 22 + np.abs(home_xg - away_xg) * 2.5
     markets["Over 24.5 Fouls"] = 1 - poisson.cdf(24, avg_fouls)
     markets["Under 26.5 Fouls"] = poisson.cdf(26, avg_fouls)
     
-    avg_cards = 3.5 + abs(home_xg - away_xg) * 0.8
+    avg_cards = 3.5 + np.abs(home_xg - away_xg) * 0.8
     markets["Over 3.5 Cards"] = 1 - poisson.cdf(3, avg_cards)
     markets["Under 5.5 Cards"] = poisson.cdf(5, avg_cards)
     
-    markets["Home Win"] = sum(p for (h, a), p in matrix.items() if h > a)
-    markets["Away Win"] = sum(p for (h, a), p in matrix.items() if h < a)
-    markets["Draw"] = sum(p for (h, a), p in matrix.items() if h == a)
+    for name in RESULT_MARKETS:
+        markets[name] = goal_probs[name]
     
-    return markets
+    return pd.DataFrame(markets)
+
+def calculate_diverse_markets(home_xg: float, away_xg: float) -> dict:
+    return calculate_diverse_markets_batch([home_xg], [away_xg]).iloc[0].to_dict()
 
 @st.cache_data(ttl=1800, show_spinner=False)
 def get_all_fixtures() -> pd.DataFrame:
@@ -175,8 +182,12 @@ def get_all_fixtures() -> pd.DataFrame:
     tomorrow = (date.today() + timedelta(days=1)).strftime("%Y-%m-%d")
     all_fixtures = []
     
-    for league_name, comp_id in COMPETITIONS.items():
-        data = api_get(f"competitions/{comp_id}/matches", {"dateFrom": today, "dateTo": tomorrow})
+    # Every competition requested concurrently
+    responses = fetch_all(api_get, [
+        (f"competitions/{comp_id}/matches", {"dateFrom": today, "dateTo": tomorrow})
+        for comp_id in COMPETITIONS.values()
+    ])
+    for league_name, data in zip(COMPETITIONS, responses):
         for match in data.get("matches", []):
             if match.get("status") not in ["SCHEDULED", "TIMED"]:
                 continue
@@ -189,7 +200,6 @@ def get_all_fixtures() -> pd.DataFrame:
                 "away_id": away_team.get("id", 0),
                 "league": league_name,
             })
-        time.sleep(0.2)
     
     df = pd.DataFrame(all_fixtures)
     if df.empty:
@@ -197,10 +207,10 @@ def get_all_fixtures() -> pd.DataFrame:
     return df
 
 @st.cache_data(ttl=7200, show_spinner=False)
-def get_team_xg(team_id: int, home: bool = True) -> float:
-    data = api_get(f"teams/{team_id}/matches", {"status": "FINISHED", "limit": 10})
+def get_team_base_rate(team_id: int) -> float | None:
+    """Average goals over the last 10 finished matches; cached once per team, not per side."""
     goals_scored = []
-    for match in data.get("matches", []):
+    for match in get_match_history().team_form(team_id, api_get, limit=10):
         home_team = match.get("homeTeam", {})
         away_team = match.get("awayTeam", {})
         score = match.get("score", {}).get("fullTime", {})
@@ -213,9 +223,22 @@ def get_team_xg(team_id: int, home: bool = True) -> float:
             if goals is not None:
                 goals_scored.append(int(goals))
     if goals_scored:
-        return round(sum(goals_scored) / len(goals_scored) * (1.05 if home else 0.95), 2)
+        return sum(goals_scored) / len(goals_scored)
+    return None
+
+def team_xg(base: float | None, home: bool = True) -> float:
+    if base is not None:
+        return round(base * (1.05 if home else 0.95), 2)
     return 1.4 if home else 1.2
 
+def add_team_xg(fixtures: pd.DataFrame) -> pd.DataFrame:
+    """home_xg / away_xg from one base-rate lookup per distinct team in the frame."""
+    team_ids = sorted({int(t) for t in fixtures["home_id"]} | {int(t) for t in fixtures["away_id"]})
+    rates = dict(zip(team_ids, fetch_all(get_team_base_rate, team_ids)))
+    fixtures["home_xg"] = [team_xg(rates[int(t)], True) for t in fixtures["home_id"]]
+    fixtures["away_xg"] = [team_xg(rates[int(t)], False) for t in fixtures["away_id"]]
+    return fixtures
+
 def get_mock_fixtures() -> pd.DataFrame:
     data = [
         ("Arsenal", "Chelsea", 1.8, 1.4, "Premier League"),
@@ -235,15 +258,18 @@ def get_mock_fixtures() -> pd.DataFrame:
     for home, away, home_xg, away_xg, league in data:
         fixtures.append({
             "home": home, "away": away,
-            "home_id": hash(home) % 10000, "away_id": hash(away) % 10000,
+            "home_id": stable_number(home, 10000), "away_id": stable_number(away, 10000),
             "home_xg": home_xg, "away_xg": away_xg, "league": league
         })
     return pd.DataFrame(fixtures)
 
-def generate_all_flashcards(fixtures: pd.DataFrame) -> list:
+MAX_FLASHCARDS = 300   # deepest a page, save or download ever reads into the stream
+SETS_PER_PAGE = 10
+
+def build_flashcard_bets(fixtures: pd.DataFrame) -> list:
     all_bets = []
-    for _, row in fixtures.iterrows():
-        markets = calculate_diverse_markets(row["home_xg"], row["away_xg"])
+    market_table = calculate_diverse_markets_batch(fixtures["home_xg"], fixtures["away_xg"])
+    for (_, row), (_, markets) in zip(fixtures.iterrows(), market_table.iterrows()):
         match_name = f"{row['home']} vs {row['away']}"
         
         for market, prob in markets.items():
@@ -254,21 +280,23 @@ def generate_all_flashcards(fixtures: pd.DataFrame) -> list:
                     "prob": prob,
                     "league": row["league"]
                 })
-    
-    if len(all_bets) < 3:
-        return []
-    
-    results = []
-    for combo in itertools.combinations(all_bets, 3):
-        if len({b["match"] for b in combo}) < 3:
-            continue
-        combined = combo[0]["prob"] * combo[1]["prob"] * combo[2]["prob"]
-        if combined >= 0.35:
-            results.append({"bets": list(combo), "prob": combined})
-        if len(results) >= 300:
-            break
-    
-    return sorted(results, key=lambda x: x["prob"], reverse=True)
+    return all_bets
+
+def get_flashcard_pager(fixtures: pd.DataFrame, legs: int = 3) -> SetPager:
+    """Lazy best-first set stream, kept across reruns until fixtures or legs change"""
+    key = (legs, tuple(fixtures[["home", "away", "home_xg", "away_xg"]].itertuples(index=False)))
+    cached = st.session_state.get("flashcard_pager")
+    if cached is None or cached[0] != key:
+        table = LegTable.from_bets(build_flashcard_bets(fixtures))
+        stream = iter_sets(table.legs, legs, 0.35)
+        # Dict views are built only for the sets a page actually reads
+        def build(prob, combo):
+            card = table.set_dict(prob, [leg.index for leg in combo])
+            card["set_id"] = set_id(card["bets"])
+            return card
+        cached = (key, SetPager(stream, build))
+        st.session_state.flashcard_pager = cached
+    return cached[1]
 
 # ══════════════════════════════════════════════════════════════════════════════
 # UI - TABS
@@ -288,6 +316,7 @@ with tab1:
     
     # Load data
     use_real_data = not st.checkbox("Use Mock Data", value=False, key="use_mock_live")
+    set_legs = st.selectbox("Legs per set", [2, 3, 4, 5], index=1, key="set_legs_live")
     
     with st.spinner("🔄 Loading fixtures..."):
         if not use_real_data:
@@ -297,31 +326,33 @@ with tab1:
             all_fixtures = get_all_fixtures()
             if "home_xg" not in all_fixtures.columns and not all_fixtures.empty:
                 with st.spinner("🧮 Calculating xG..."):
-                    all_fixtures["home_xg"] = all_fixtures["home_id"].apply(lambda x: get_team_xg(x, True))
-                    all_fixtures["away_xg"] = all_fixtures["away_id"].apply(lambda x: get_team_xg(x, False))
+                    sync_competitions(api_get, COMPETITIONS.values())
+                    add_team_xg(all_fixtures)
     
     if all_fixtures.empty:
         st.error("❌ No fixtures available")
         st.stop()
     
     league_counts = all_fixtures['league'].value_counts().to_dict()
-    all_flashcards = generate_all_flashcards(all_fixtures)
+    flashcards = get_flashcard_pager(all_fixtures, set_legs)
     
-    st.success(f"✅ Generated {len(all_flashcards)} bet sets from {len(all_fixtures)} fixtures")
+    st.success(f"✅ Streaming bet sets from {len(all_fixtures)} fixtures")
     
     # Save and download buttons
     col1, col2 = st.columns([1, 1])
     
     with col1:
         if st.button("💾 Save to Archive", type="primary"):
+            all_flashcards = flashcards.take(MAX_FLASHCARDS)
             save_sets_to_archive(all_flashcards, date.today().isoformat())
             st.success(f"✅ Saved {len(all_flashcards)} sets to archive!")
     
     with col2:
         # Download as CSV
-        if all_flashcards:
+        top_flashcards = flashcards.take(50)  # Top 50
+        if top_flashcards:
             csv_data = []
-            for i, card in enumerate(all_flashcards[:50], 1):  # Top 50
+            for i, card in enumerate(top_flashcards, 1):
                 for bet in card['bets']:
                     csv_data.append({
                         'Set_Number': i,
@@ -362,12 +393,14 @@ with tab1:
     }
     
     min_prob, max_prob = range_map[threshold]
-    filtered_sets = [s for s in all_flashcards if min_prob <= s['prob'] < max_prob]
+    page = st.number_input("Page", min_value=1, value=1, step=1, key=f"set_page_{threshold}")
+    offset = (page - 1) * SETS_PER_PAGE
+    filtered_sets = flashcards.in_range(min_prob, max_prob, offset, SETS_PER_PAGE, limit=MAX_FLASHCARDS)
     
-    st.write(f"**Found {len(filtered_sets)} sets in {threshold} range**")
+    st.write(f"**Showing {len(filtered_sets)} sets in {threshold} range (page {page})**")
     
-    # Display top 10 sets
-    for i, card in enumerate(filtered_sets[:10], 1):
+    # Display one page of sets
+    for i, card in enumerate(filtered_sets, offset + 1):
         with st.expander(f"Set #{i} — {card['prob']*100:.1f}%"):
             for bet in card['bets']:
                 st.write(f"• **{bet['match']}** — {bet['market']} ({bet['prob']*100:.1f}%)")
@@ -408,8 +441,13 @@ with tab2:
             
             st.markdown("---")
             
-            # Show sets with result marking
-            for i, card in enumerate(archive_entry['sets'][:20], 1):
+            # Show one page of sets with result marking
+            archive_sets = archive_entry['sets']
+            pages = max(1, -(-len(archive_sets) // 20))
+            archive_page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1,
+                                           key=f"archive_page_{selected_date}")
+            start = (archive_page - 1) * 20
+            for i, card in enumerate(archive_sets[start:start + 20], start + 1):
                 result = results.get(i-1)
                 
                 # Status indicator
@@ -0,0 +1,131 @@
+"""
+models/form.py
+--------------
+Vectorized team form over league-wide match history.
+
+The elite xG used to be computed one team at a time from a per-team
+``teams/{id}/matches`` request. Here the finished matches of whole
+competitions (see utils.history) go through one pandas pass that yields,
+for every fixture side at once, the same figures calculate_elite_xg
+produced:
+
+  1. weighted recent form (last 10 home or away games, decaying weights)
+  2. form trend (last 3 vs the 3 before)
+  3. home/away split (falling back to the other split when one is empty)
+  4. head-to-head adjustment (3+ meetings among the recent games)
+  5. home/away advantage
+
+Each team's window is its RECENT_MATCHES most recent games, as the
+per-team request returned.
+"""
+
+import numpy as np
+import pandas as pd
+
+RECENT_MATCHES = 15
+FORM_WEIGHTS = np.array([0.30, 0.25, 0.20, 0.15, 0.10, 0.05, 0.03, 0.02, 0.01, 0.01])
+
+# (recent / older ratio above which, multiplier) hot streaks, checked in order
+HOT_STREAK = ((1.4, 1.15), (1.2, 1.10), (1.1, 1.05))
+# (ratio below which, multiplier) cold streaks, checked in order
+COLD_STREAK = ((0.6, 0.85), (0.8, 0.90), (0.9, 0.95))
+
+H2H_MIN_MEETINGS = 3
+LOCATION_MULTIPLIER = {True: 1.08, False: 0.92}
+DEFAULT_XG = {True: 1.4, False: 1.2}
+
+
+def appearances(matches: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per (match, team) from a match table with match_id, utc_date,
+    home_id, away_id, home_goals, away_goals, limited to each team's
+    RECENT_MATCHES most recent games (newest first, ties by match_id as in
+    MatchHistory.team_matches). Columns: team_id, opponent_id, is_home,
+    goals, utc_date, match_id.
+    """
+    common = {"utc_date": matches["utc_date"], "match_id": matches["match_id"]}
+    home = pd.DataFrame({"team_id": matches["home_id"], "opponent_id": matches["away_id"],
+                         "is_home": True, "goals": matches["home_goals"], **common})
+    away = pd.DataFrame({"team_id": matches["away_id"], "opponent_id": matches["home_id"],
+                         "is_home": False, "goals": matches["away_goals"], **common})
+    long = pd.concat([home, away], ignore_index=True)
+    long = long.sort_values(["team_id", "utc_date", "match_id"], ascending=[True, False, False])
+    return long.groupby("team_id", sort=False).head(RECENT_MATCHES).reset_index(drop=True)
+
+
+def _split_stats(recent: pd.DataFrame) -> pd.DataFrame:
+    """Weighted average and trend multiplier per (team_id, is_home) split."""
+    recent = recent.copy()
+    recent["rank"] = recent.groupby(["team_id", "is_home"], sort=False).cumcount()
+    top = recent[recent["rank"] < FORM_WEIGHTS.size].copy()
+    top["w"] = FORM_WEIGHTS[top["rank"].to_numpy()]
+    top["wg"] = top["w"] * top["goals"]
+    top["first3"] = top["goals"].where(top["rank"] < 3, 0)
+    top["next3"] = top["goals"].where(top["rank"].between(3, 5), 0)
+    stats = top.groupby(["team_id", "is_home"]).agg(
+        wg=("wg", "sum"), w=("w", "sum"), n=("goals", "size"),
+        first3=("first3", "sum"), next3=("next3", "sum"),
+    )
+    stats["weighted_avg"] = stats["wg"] / stats["w"]
+
+    recent_avg = stats["first3"] / 3
+    older_avg = stats["next3"] / (stats["n"] - 3).clip(lower=1, upper=3)
+    conditions, choices = [], []
+    for ratio, mult in HOT_STREAK:
+        conditions.append(recent_avg > older_avg * ratio)
+        choices.append(mult)
+    for ratio, mult in COLD_STREAK:
+        conditions.append(recent_avg < older_avg * ratio)
+        choices.append(mult)
+    stats["form"] = np.where(stats["n"] >= 5, np.select(conditions, choices, 1.0), 1.0)
+    return stats[["weighted_avg", "form"]]
+
+
+def elite_xg_table(matches: pd.DataFrame, fixtures: pd.DataFrame) -> pd.DataFrame:
+    """
+    ``home_xg`` / ``away_xg`` for every fixture (home_id, away_id) in one
+    pass over ``matches``, indexed like ``fixtures``.
+    """
+    sides = pd.DataFrame({
+        "team_id": np.concatenate([fixtures["home_id"].to_numpy(), fixtures["away_id"].to_numpy()]),
+        "opponent_id": np.concatenate([fixtures["away_id"].to_numpy(), fixtures["home_id"].to_numpy()]),
+        "home": np.repeat([True, False], len(fixtures)),
+    }).astype({"team_id": "int64", "opponent_id": "int64"})
+    if matches.empty:
+        return _per_fixture(fixtures, sides["home"].map(DEFAULT_XG).to_numpy())
+
+    recent = appearances(matches)
+    stats = _split_stats(recent)
+
+    # Preferred split (home games for the home side), else the other one
+    def lookup(is_home, column):
+        index = pd.MultiIndex.from_arrays([sides["team_id"], is_home])
+        return stats[column].reindex(index).to_numpy()
+
+    same = sides["home"].to_numpy()
+    avg = lookup(same, "weighted_avg")
+    form = lookup(same, "form")
+    fallback = np.isnan(avg)
+    avg = np.where(fallback, lookup(~same, "weighted_avg"), avg)
+    form = np.where(fallback, lookup(~same, "form"), form)
+
+    # Head-to-head among each side's recent games
+    h2h = recent.groupby(["team_id", "opponent_id"])["goals"].agg(["mean", "size"])
+    pairs = h2h.reindex(pd.MultiIndex.from_arrays([sides["team_id"], sides["opponent_id"]]))
+    meetings = pairs["size"].fillna(0).to_numpy()
+    h2h_avg = pairs["mean"].to_numpy()
+    h2h_mult = np.select(
+        [(meetings >= H2H_MIN_MEETINGS) & (h2h_avg > avg * 1.3),
+         (meetings >= H2H_MIN_MEETINGS) & (h2h_avg < avg * 0.7)],
+        [1.20, 0.80], 1.0,
+    )
+
+    location = np.where(same, LOCATION_MULTIPLIER[True], LOCATION_MULTIPLIER[False])
+    xg = np.round(avg * form * h2h_mult * location, 2)
+    xg = np.where(np.isnan(xg), sides["home"].map(DEFAULT_XG).to_numpy(), xg)
+    return _per_fixture(fixtures, xg)
+
+
+def _per_fixture(fixtures: pd.DataFrame, xg: np.ndarray) -> pd.DataFrame:
+    n = len(fixtures)
+    return pd.DataFrame({"home_xg": xg[:n], "away_xg": xg[n:]}, index=fixtures.index)
@@ -0,0 +1,116 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from models.market_table import get_market_table
+from models.markets import price_fixtures
+from models.poisson import TAIL_EPS
+
+# xG values are rounded to 2-3 decimals upstream; quantize keys to match
+XG_DECIMALS = 3
+
+MAX_ENTRIES = 50_000
+MAX_BYTES   = 32 * 1024 * 1024
+
+
+class MarketCache:
+    """
+    Bounded LRU of priced market vectors keyed by the quantized xG pair.
+
+    One instance is shared process-wide (see MARKET_CACHE), so every
+    dashboard, session and Streamlit rerun reuses prices for xG pairs it has
+    already seen. Evicts least-recently-used entries once either the entry
+    count or the stored array bytes exceed their cap. Thread-safe.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, decimals=XG_DECIMALS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.decimals = decimals
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def price(self, home_xg, away_xg, markets, mode="grid", tail_eps=TAIL_EPS):
+        """Cached equivalent of ``price_fixtures`` (adaptive grids): N x M."""
+        markets = tuple(markets)
+        home = np.round(np.asarray(home_xg, dtype=float).reshape(-1), self.decimals)
+        away = np.round(np.asarray(away_xg, dtype=float).reshape(-1), self.decimals)
+        keys = [(h, a, markets, mode, tail_eps) for h, a in zip(home.tolist(), away.tolist())]
+
+        probs = np.empty((len(keys), len(markets)))
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                row = self._entries.get(key)
+                if row is None:
+                    missing.append(i)
+                    continue
+                self._entries.move_to_end(key)
+                probs[i] = row
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            priced = self._price_missing(home[missing], away[missing], markets, mode, tail_eps)
+            probs[missing] = priced
+            with self._lock:
+                for i, row in zip(missing, priced):
+                    self._store(keys[i], row)
+        return probs
+
+    @staticmethod
+    def _price_missing(home, away, markets, mode, tail_eps):
+        """Read on-lattice pairs from the precomputed table if one is built, price the rest."""
+        probs = np.empty((home.size, len(markets)))
+        todo = np.ones(home.size, dtype=bool)
+        table = get_market_table()
+        if table is not None and table.covers(markets, mode, tail_eps):
+            todo = ~table.on_grid(home, away)
+            probs[~todo] = table.lookup(home[~todo], away[~todo], markets)
+        if todo.any():
+            probs[todo] = price_fixtures(home[todo], away[todo], markets,
+                                         mode=mode, tail_eps=tail_eps)
+        return probs
+
+    def _store(self, key, row):
+        row = np.array(row)
+        row.setflags(write=False)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._entries[key] = row
+        self._bytes += row.nbytes
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits":     self.hits,
+                "misses":   self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries":  len(self._entries),
+                "bytes":    self._bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+MARKET_CACHE = MarketCache()
+
+
+def cached_price_fixtures(home_xg, away_xg, markets, mode="grid", tail_eps=TAIL_EPS):
+    """``price_fixtures`` through the process-wide MARKET_CACHE."""
+    return MARKET_CACHE.price(home_xg, away_xg, markets, mode, tail_eps)
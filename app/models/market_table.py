@@ -0,0 +1,133 @@
+"""
+models/market_table.py
+----------------------
+Precomputed goal-market surface over the xG plane.
+
+Every fixture is priced from a rounded (home_xg, away_xg) pair in roughly
+[0, 5]², so the whole surface can be tabulated once at 0.01 resolution and
+memory-mapped by every Streamlit worker (the OS page cache shares it).
+
+Build (once per deploy, or whenever the model changes):
+    python -m models.market_table            # from the app/ directory
+"""
+
+import json
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from models.markets import GOAL_MARKETS, price_fixtures
+from models.poisson import TAIL_EPS
+
+TABLE_PATH = Path(__file__).with_name("market_table.npy")
+XG_STEP    = 0.01
+XG_MAX     = 5.0
+TABLE_MODE = "closed_form"
+
+# Tolerance (in table rows) for treating an xG as sitting exactly on a row
+ON_GRID_TOL = 1e-6
+
+
+def _meta_path(path: Path) -> Path:
+    return path.with_suffix(".json")
+
+
+def build_market_table(path: Path = TABLE_PATH, step: float = XG_STEP, xg_max: float = XG_MAX,
+                       markets=None, mode: str = TABLE_MODE, tail_eps: float = TAIL_EPS) -> Path:
+    """
+    Write an X x X x M float32 table of market prices, where X covers
+    0..xg_max in ``step`` increments on both axes, plus a JSON sidecar with
+    the axes and market order. Rows are priced and flushed one home-xG
+    slice at a time so memory stays flat.
+    """
+    markets = list(markets or GOAL_MARKETS)
+    axis = np.round(np.arange(0.0, xg_max + step / 2, step), 6)
+
+    table = np.lib.format.open_memmap(
+        path, mode="w+", dtype=np.float32, shape=(axis.size, axis.size, len(markets))
+    )
+    for i, home_xg in enumerate(axis):
+        table[i] = price_fixtures(np.full(axis.size, home_xg), axis, markets,
+                                  mode=mode, tail_eps=tail_eps)
+    table.flush()
+    del table
+
+    _meta_path(path).write_text(json.dumps({
+        "step":     step,
+        "xg_max":   float(axis[-1]),
+        "size":     int(axis.size),
+        "mode":     mode,
+        "tail_eps": tail_eps,
+        "markets":  markets,
+    }, indent=2))
+    return path
+
+
+class MarketTable:
+    """Read-only, memory-mapped view of a table written by build_market_table."""
+
+    def __init__(self, path: Path = TABLE_PATH):
+        meta = json.loads(_meta_path(path).read_text())
+        self.step     = meta["step"]
+        self.xg_max   = meta["xg_max"]
+        self.mode     = meta["mode"]
+        self.tail_eps = meta["tail_eps"]
+        self.markets  = meta["markets"]
+        self._column  = {name: m for m, name in enumerate(self.markets)}
+        self.table    = np.load(path, mmap_mode="r")
+
+    def covers(self, markets, mode: str, tail_eps: float = TAIL_EPS) -> bool:
+        return (mode == self.mode and tail_eps == self.tail_eps
+                and all(name in self._column for name in markets))
+
+    def on_grid(self, home_xg, away_xg) -> np.ndarray:
+        """Mask of fixtures whose xG pair is exactly a table row (no interpolation needed)."""
+        last = self.table.shape[0] - 1
+        masks = []
+        for xg in (home_xg, away_xg):
+            pos = np.asarray(xg, dtype=float).reshape(-1) / self.step
+            masks.append((pos >= 0) & (pos <= last + ON_GRID_TOL)
+                         & (np.abs(pos - np.rint(pos)) < ON_GRID_TOL))
+        return masks[0] & masks[1]
+
+    def lookup(self, home_xg, away_xg, markets) -> np.ndarray:
+        """Nearest-row read by index: N x M. Inputs are clipped to the table range."""
+        cols = [self._column[name] for name in markets]
+        h = np.rint(self._position(home_xg)).astype(int)
+        a = np.rint(self._position(away_xg)).astype(int)
+        return np.asarray(self.table[h, a][:, cols], dtype=float)
+
+    def interpolate(self, home_xg, away_xg, markets) -> np.ndarray:
+        """Bilinear interpolation between the four surrounding rows: N x M."""
+        cols = [self._column[name] for name in markets]
+        home = self._position(home_xg)
+        away = self._position(away_xg)
+        h0 = np.minimum(np.floor(home).astype(int), self.table.shape[0] - 2)
+        a0 = np.minimum(np.floor(away).astype(int), self.table.shape[1] - 2)
+        th = (home - h0)[:, None]
+        ta = (away - a0)[:, None]
+
+        def cell(h, a):
+            return np.asarray(self.table[h, a][:, cols], dtype=float)
+
+        return ((1 - th) * (1 - ta) * cell(h0, a0) + (1 - th) * ta * cell(h0, a0 + 1)
+                + th * (1 - ta) * cell(h0 + 1, a0) + th * ta * cell(h0 + 1, a0 + 1))
+
+    def _position(self, xg) -> np.ndarray:
+        xg = np.clip(np.asarray(xg, dtype=float).reshape(-1), 0.0, self.xg_max)
+        return xg / self.step
+
+
+@lru_cache(maxsize=1)
+def get_market_table(path: Path = TABLE_PATH):
+    """Process-wide MarketTable, or None when no table has been built."""
+    if not path.exists() or not _meta_path(path).exists():
+        return None
+    return MarketTable(path)
+
+
+if __name__ == "__main__":
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else TABLE_PATH
+    print(f"Wrote {build_market_table(target)}")
@@ -0,0 +1,105 @@
+from functools import lru_cache
+
+import numpy as np
+
+from models.poisson import adaptive_score_matrices, marginal_markets, score_matrices, TAIL_EPS
+
+# Every market that can be settled from the final score alone, as a
+# predicate over (home_goals, away_goals). Several names are aliases used
+# by different dashboards for the same outcome.
+GOAL_MARKETS = {
+    "Over 0.5 Goals":          lambda h, a: h + a > 0,
+    "Over 1.5 Goals":          lambda h, a: h + a > 1,
+    "Over 2.5 Goals":          lambda h, a: h + a > 2,
+    "Over 3.5 Goals":          lambda h, a: h + a > 3,
+    "Under 1.5 Goals":         lambda h, a: h + a < 2,
+    "Under 2.5 Goals":         lambda h, a: h + a < 3,
+    "Under 3.5 Goals":         lambda h, a: h + a < 4,
+    "Under 4.5 Goals":         lambda h, a: h + a < 5,
+    "BTTS Yes":                lambda h, a: h >= 1 and a >= 1,
+    "BTTS":                    lambda h, a: h >= 1 and a >= 1,
+    "Both Teams To Score":     lambda h, a: h >= 1 and a >= 1,
+    "BTTS No":                 lambda h, a: h == 0 or a == 0,
+    "BTTS & Over 2.5":         lambda h, a: h >= 1 and a >= 1 and h + a > 2,
+    "Home Win":                lambda h, a: h > a,
+    "Away Win":                lambda h, a: h < a,
+    "Draw":                    lambda h, a: h == a,
+    "Double Chance 1X":        lambda h, a: h >= a,
+    "Double Chance X2":        lambda h, a: h <= a,
+    "Double Chance Home (1X)": lambda h, a: h >= a,
+    "Double Chance Away (X2)": lambda h, a: h <= a,
+}
+
+
+@lru_cache(maxsize=None)
+def market_weights(markets, max_goals):
+    """
+    G² x M 0/1 weight matrix for a tuple of GOAL_MARKETS names.
+
+    Row h * G + a is the score h-a, column m is 1 when that score settles
+    market m as a winner. Compiled once per (markets, grid size).
+    """
+    size = max_goals + 1
+    weights = np.zeros((size * size, len(markets)))
+    for m, name in enumerate(markets):
+        settles = GOAL_MARKETS[name]
+        for h in range(size):
+            for a in range(size):
+                if settles(h, a):
+                    weights[h * size + a, m] = 1.0
+    weights.setflags(write=False)
+    return weights
+
+
+def price_markets(grids, markets):
+    """
+    Price goal markets for every fixture in one matrix product.
+
+    ``grids`` is the N x G x G output of ``score_matrices``; returns an
+    N x M array of probabilities in the order of ``markets``.
+    """
+    n, size, _ = grids.shape
+    return grids.reshape(n, size * size) @ market_weights(tuple(markets), size - 1)
+
+
+def fixture_grids(home_xg, away_xg, max_goals=None, tail_eps=TAIL_EPS):
+    """
+    ``(grids, residual)``: fixed ``max_goals`` score grids, or adaptive ones
+    when it is None, with the probability mass each fixture's grid leaves out.
+    """
+    if max_goals is None:
+        grids, _, residual = adaptive_score_matrices(home_xg, away_xg, tail_eps)
+        return grids, residual
+    grids = score_matrices(home_xg, away_xg, max_goals)
+    return grids, np.clip(1 - grids.sum(axis=(1, 2)), 0.0, 1.0)
+
+
+def price_fixtures(home_xg, away_xg, markets, max_goals=None, mode="grid", tail_eps=TAIL_EPS,
+                   return_residual=False):
+    """
+    N x M goal-market prices straight from xG arrays.
+
+    mode="grid" sums the score grid; mode="closed_form" uses the exact
+    marginal distributions from ``marginal_markets`` and only builds a grid
+    for markets that need the joint score (e.g. "BTTS & Over 2.5").
+    Grids are truncated at ``max_goals``, or per fixture so the dropped
+    tail stays under ``tail_eps`` when ``max_goals`` is None.
+
+    With ``return_residual`` the result is ``(probs, residual)``, where
+    ``residual`` is the tail mass each fixture's grid dropped (zero when
+    closed_form priced every market without a grid).
+    """
+    markets = list(markets)
+    if mode == "grid":
+        grids, residual = fixture_grids(home_xg, away_xg, max_goals, tail_eps)
+        probs = price_markets(grids, markets)
+    elif mode == "closed_form":
+        probs = marginal_markets(home_xg, away_xg, markets)
+        residual = np.zeros(probs.shape[0])
+        joint = [m for m, name in enumerate(markets) if np.isnan(probs[:, m]).any()]
+        if joint:
+            grids, residual = fixture_grids(home_xg, away_xg, max_goals, tail_eps)
+            probs[:, joint] = price_markets(grids, [markets[m] for m in joint])
+    else:
+        raise ValueError(f"Unknown pricing mode: {mode!r}")
+    return (probs, residual) if return_residual else probs
@@ -0,0 +1,152 @@
+"""
+models/odds.py
+--------------
+Market-blended probabilities.
+
+Bookmaker prices for the current fixtures are bulk-loaded into one
+columnar table (fixture_id, market, bookmaker, odds) from a local file
+feed (CSV or JSON records) keyed by the football-data fixture IDs and the
+dashboard's market names. Then, in vectorized passes:
+
+  1. implied probability = 1 / odds
+  2. overround removed per (fixture, bookmaker, market group), i.e. over
+     the mutually exclusive outcomes of 1X2, each Over/Under line, BTTS
+     and double chance (whose outcomes sum to 2). Groups with only some
+     outcomes quoted fall back to a flat DEFAULT_OVERROUND
+  3. consensus fair probability (mean over bookmakers) and best price
+     per (fixture, market)
+  4. blended with the model: (1 - w) * model + w * market, wherever a
+     market price exists
+"""
+
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ODDS_COLUMNS = ["fixture_id", "market", "bookmaker", "odds"]
+
+# Weight of the de-vigged market probability in the blend
+MARKET_WEIGHT = 0.5
+# Assumed margin when a market group is only partly quoted
+DEFAULT_OVERROUND = 0.05
+
+TOTALS = re.compile(r"^(Over|Under) (\d+(?:\.\d+)?) Goals$")
+# Outcome sets that partition the result, and the probability each sums to
+MARKET_GROUPS = {
+    "Home Win": ("1x2", 3, 1.0), "Draw": ("1x2", 3, 1.0), "Away Win": ("1x2", 3, 1.0),
+    "BTTS Yes": ("btts", 2, 1.0), "Both Teams To Score": ("btts", 2, 1.0),
+    "BTTS": ("btts", 2, 1.0), "BTTS No": ("btts", 2, 1.0),
+    "Double Chance Home (1X)": ("dc", 3, 2.0), "Double Chance Away (X2)": ("dc", 3, 2.0),
+    "Double Chance (12)": ("dc", 3, 2.0),
+    "Double Chance 1X": ("dc", 3, 2.0), "Double Chance X2": ("dc", 3, 2.0),
+    "Double Chance 12": ("dc", 3, 2.0),
+}
+
+
+def market_group(market: str) -> tuple:
+    """``(group, outcomes in the group, probability the group sums to)``."""
+    totals = TOTALS.match(market)
+    if totals:
+        return f"total {float(totals.group(2))}", 2, 1.0
+    return MARKET_GROUPS.get(market, (f"single {market}", 1, 1.0))
+
+
+# ── Ingestion ──────────────────────────────────────────────────────────────────
+
+def odds_frame(rows) -> pd.DataFrame:
+    """
+    Normalize raw rows / a frame into the columnar odds table. Raises
+    ValueError when fixture_id, market or odds is missing.
+    """
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return pd.DataFrame(columns=ODDS_COLUMNS)
+    missing = [c for c in ODDS_COLUMNS if c != "bookmaker" and c not in df.columns]
+    if missing:
+        raise ValueError(f"odds feed is missing column(s): {', '.join(missing)}")
+    if "bookmaker" not in df.columns:
+        df["bookmaker"] = "feed"
+    df = df[ODDS_COLUMNS].copy()
+    df["fixture_id"] = df["fixture_id"].astype(str)
+    df["market"] = df["market"].astype(str)
+    df["bookmaker"] = df["bookmaker"].astype(str)
+    df["odds"] = pd.to_numeric(df["odds"], errors="coerce")
+    return df[df["odds"] > 1].reset_index(drop=True)
+
+
+def load_odds_file(path) -> pd.DataFrame:
+    """Bulk-load a local odds feed (.csv, or .json list of records)."""
+    path = Path(path)
+    if not path.exists():
+        return odds_frame([])
+    if path.suffix == ".json":
+        return odds_frame(pd.read_json(path))
+    return odds_frame(pd.read_csv(path))
+
+
+# ── De-vig, consensus, blend ───────────────────────────────────────────────────
+
+def market_probabilities(odds: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fair probability per (fixture_id, market) with the overround removed,
+    plus the best available price. Columns: fixture_id, market,
+    market_prob, best_odds.
+    """
+    if odds.empty:
+        return pd.DataFrame(columns=["fixture_id", "market", "market_prob", "best_odds"])
+
+    groups = pd.DataFrame([market_group(m) for m in odds["market"]],
+                          columns=["group", "size", "total"], index=odds.index)
+    df = pd.concat([odds, groups], axis=1)
+    df["implied"] = 1.0 / df["odds"]
+
+    keys = [df["fixture_id"], df["bookmaker"], df["group"]]
+    book = df.groupby(keys)["implied"]
+    complete = book.transform("size") >= df["size"]
+    df["fair"] = np.where(
+        complete,
+        df["implied"] * df["total"] / book.transform("sum"),
+        df["implied"] / (1 + DEFAULT_OVERROUND),
+    )
+    df["fair"] = df["fair"].clip(0.0, 1.0)
+
+    return (df.groupby(["fixture_id", "market"], as_index=False)
+              .agg(market_prob=("fair", "mean"), best_odds=("odds", "max")))
+
+
+def blend_probabilities(model_prob, market_prob, weight: float = MARKET_WEIGHT) -> np.ndarray:
+    """Linear blend; where the market is missing (NaN) the model stands alone."""
+    model_prob = np.asarray(model_prob, dtype=float)
+    market_prob = np.asarray(market_prob, dtype=float)
+    return np.where(np.isnan(market_prob), model_prob,
+                    (1 - weight) * model_prob + weight * market_prob)
+
+
+def blend_bets(bets: list, odds: pd.DataFrame, weight: float = MARKET_WEIGHT) -> list:
+    """
+    Blend every leg (dicts with "match_id", "market", "prob") against the
+    odds table in one pass. Priced legs get "prob" blended, the model value
+    kept as "model_prob", and "market_prob" / "odds" (best price) added.
+    Legs are updated in place and returned.
+    """
+    if not bets or odds is None or odds.empty:
+        return bets
+    market = market_probabilities(odds)
+    legs = pd.DataFrame({
+        "fixture_id": [str(b.get("match_id", "")) for b in bets],
+        "market": [b["market"] for b in bets],
+    })
+    joined = legs.merge(market, on=["fixture_id", "market"], how="left")
+    model = np.array([b["prob"] for b in bets], dtype=float)
+    blended = blend_probabilities(model, joined["market_prob"].to_numpy(dtype=float), weight)
+
+    for bet, prob, market_prob, best in zip(bets, blended, joined["market_prob"], joined["best_odds"]):
+        if np.isnan(market_prob):
+            continue
+        bet["model_prob"] = bet["prob"]
+        bet["prob"] = float(prob)
+        bet["market_prob"] = float(market_prob)
+        bet["odds"] = float(best)
+    return bets
@@ -1,11 +1,126 @@
 import math
+import re
+
+import numpy as np
+from scipy.stats import poisson as poisson_dist, skellam
+
+# Over/Under x.5 goal lines, e.g. "Over 2.5 Goals"
+TOTALS_MARKET = re.compile(r"^(Over|Under) (\d+)\.5 Goals$")
+
+# Adaptive grids: default dropped-tail budget and a hard ceiling on goals
+TAIL_EPS = 1e-6
+MAX_ADAPTIVE_GOALS = 30
+
+# Skellam is undefined at a zero rate; clamp to something negligible
+MIN_RATE = 1e-9
 
 def poisson(k, lam):
     return (lam ** k * math.exp(-lam)) / math.factorial(k)
 
+def poisson_pmf_vectors(lam, max_goals=5):
+    """
+    P(X = k) for k = 0..max_goals, one row per rate in ``lam``.
+
+    Built with the recurrence p(k) = p(k-1) * lam / k, so there is no
+    factorial or power call per cell.
+    """
+    lam = np.asarray(lam, dtype=float).reshape(-1)
+    pmf = np.empty((lam.size, max_goals + 1))
+    pmf[:, 0] = np.exp(-lam)
+    for k in range(1, max_goals + 1):
+        pmf[:, k] = pmf[:, k - 1] * lam / k
+    return pmf
+
+def score_matrices(home_xg, away_xg, max_goals=5):
+    """
+    Batch score grids for N fixtures at once.
+
+    Returns an N x G x G array (G = max_goals + 1) where [i, h, a] is the
+    probability of fixture i finishing h-a: the outer product of the two
+    Poisson pmf vectors.
+    """
+    home = poisson_pmf_vectors(home_xg, max_goals)
+    away = poisson_pmf_vectors(away_xg, max_goals)
+    if home.shape[0] != away.shape[0]:
+        raise ValueError("home_xg and away_xg must have the same length")
+    return home[:, :, None] * away[:, None, :]
+
+def adaptive_score_matrices(home_xg, away_xg, tail_eps=TAIL_EPS):
+    """
+    Batch score grids truncated per fixture rather than at a fixed max_goals.
+
+    Each fixture gets the smallest bound g such that the mass outside
+    [0..g] x [0..g] is at most ``tail_eps``. Returns ``(grids, max_goals,
+    residual)``: an N x G x G array sized to the largest bound (cells past a
+    fixture's own bound are zero), the per-fixture bounds, and the
+    probability mass each fixture's grid leaves out.
+    """
+    home = poisson_pmf_vectors(home_xg, MAX_ADAPTIVE_GOALS)
+    away = poisson_pmf_vectors(away_xg, MAX_ADAPTIVE_GOALS)
+    if home.shape[0] != away.shape[0]:
+        raise ValueError("home_xg and away_xg must have the same length")
+
+    # covered[i, g] = P(home <= g and away <= g)
+    covered = np.cumsum(home, axis=1) * np.cumsum(away, axis=1)
+    fits = 1 - covered <= tail_eps
+    max_goals = np.where(fits.any(axis=1), fits.argmax(axis=1), MAX_ADAPTIVE_GOALS)
+
+    size = int(max_goals.max(initial=0)) + 1
+    inside = np.arange(size)[None, :] <= max_goals[:, None]
+    home = np.where(inside, home[:, :size], 0.0)
+    away = np.where(inside, away[:, :size], 0.0)
+    residual = np.clip(1 - covered[np.arange(len(max_goals)), max_goals], 0.0, 1.0)
+    return home[:, :, None] * away[:, None, :], max_goals, residual
+
 def score_matrix(home_xg, away_xg, max_goals=5):
+    grid = score_matrices(home_xg, away_xg, max_goals)[0]
     return {
-        (h, a): poisson(h, home_xg) * poisson(a, away_xg)
+        (h, a): float(grid[h, a])
         for h in range(max_goals + 1)
         for a in range(max_goals + 1)
     }
+
+def marginal_markets(home_xg, away_xg, markets):
+    """
+    Closed-form market prices that skip the joint score grid.
+
+    Totals come from Poisson(home_xg + away_xg), 1X2 and double chance from
+    the Skellam goal difference, BTTS from the two zero-goal probabilities.
+    All are exact (no max_goals truncation) and vectorized over fixtures.
+
+    Returns an N x M array; columns for markets without a closed form
+    (e.g. "BTTS & Over 2.5") are NaN so the caller can fall back to a grid.
+    """
+    home = np.maximum(np.asarray(home_xg, dtype=float).reshape(-1), MIN_RATE)
+    away = np.maximum(np.asarray(away_xg, dtype=float).reshape(-1), MIN_RATE)
+    total = home + away
+
+    home_win = skellam.sf(0, home, away)
+    draw = skellam.pmf(0, home, away)
+    away_win = skellam.cdf(-1, home, away)
+    btts = np.expm1(-home) * np.expm1(-away)
+
+    closed = {
+        "Home Win":                home_win,
+        "Draw":                    draw,
+        "Away Win":                away_win,
+        "Double Chance 1X":        home_win + draw,
+        "Double Chance Home (1X)": home_win + draw,
+        "Double Chance X2":        away_win + draw,
+        "Double Chance Away (X2)": away_win + draw,
+        "BTTS Yes":                btts,
+        "BTTS":                    btts,
+        "Both Teams To Score":     btts,
+        "BTTS No":                 1 - btts,
+    }
+
+    probs = np.full((home.size, len(markets)), np.nan)
+    for m, name in enumerate(markets):
+        line = TOTALS_MARKET.match(name)
+        if line:
+            side, goals = line.groups()
+            at_most = poisson_dist.cdf(int(goals), total)
+            probs[:, m] = 1 - at_most if side == "Over" else at_most
+        elif name in closed:
+            probs[:, m] = closed[name]
+    return probs
@@ -7,7 +7,9 @@ Automatically verify bet results via API
 import streamlit as st
 import json
 from pathlib import Path
-import requests
+
+from betting.ids import dedupe_sets
+from utils.http import get_session
 
 st.set_page_config(page_title="Auto-Check Results", layout="wide")
 
@@ -29,7 +31,7 @@ def check_match_result(fixture_id: str) -> dict:
     
     headers = {"X-Auth-Token": API_KEY}
     try:
-        resp = requests.get(f"{BASE_URL}/matches/{fixture_id}", headers=headers, timeout=10)
+        resp = get_session("football-data").get(f"{BASE_URL}/matches/{fixture_id}", headers=headers, timeout=10)
         if resp.status_code == 200:
             data = resp.json()
             match = data if isinstance(data, dict) and "status" in data else data.get("match", data)
@@ -113,7 +115,10 @@ def load_archive(date_str: str) -> dict:
     file = ARCHIVE_DIR / f"sets_{date_str}.json"
     if file.exists():
         with open(file, 'r') as f:
-            return json.load(f)
+            archive = json.load(f)
+        # Stable content IDs (also upgrades legacy hash() IDs) and drops repeated sets
+        archive["sets"] = dedupe_sets(archive.get("sets", []))
+        return archive
     return None
 
 def save_archive(date_str: str, data: dict):
@@ -187,8 +192,12 @@ if selected_date:
     
     st.markdown("---")
     
-    # Display sets
-    for i, s in enumerate(archive["sets"][:30], 1):
+    # Display one page of sets
+    pages = max(1, -(-len(archive["sets"]) // 30))
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1,
+                           key=f"page_{selected_date}")
+    start = (page - 1) * 30
+    for i, s in enumerate(archive["sets"][start:start + 30], start + 1):
         result = s.get("result", "pending")
         
         if result == "correct":
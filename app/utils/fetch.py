@@ -0,0 +1,31 @@
+"""
+utils/fetch.py
+--------------
+Concurrent fan-out for the blocking API helpers.
+
+Fixture lists (one request per competition) and team form (one or two
+requests per fixture) used to be fetched one after another, so a cold
+matchday load cost the sum of every round-trip. fetch_all() issues them
+all at once from a thread pool sized to the concurrency limit.
+
+The requests themselves still go through the pooled sessions of
+utils.http. Provider quotas are the limiter's job; the pool size only
+caps concurrency.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_CONCURRENCY = 8
+
+
+def fetch_all(fn, calls, limit: int = MAX_CONCURRENCY) -> list:
+    """
+    ``[fn(*args) for args in calls]``, run concurrently with at most
+    ``limit`` calls in flight. Results come back in input order; a bare
+    (non-tuple) item is passed as the single argument.
+    """
+    calls = [args if isinstance(args, tuple) else (args,) for args in calls]
+    if not calls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(limit, len(calls))) as pool:
+        return list(pool.map(lambda args: fn(*args), calls))
@@ -1,8 +1,9 @@
 from datetime import datetime, timedelta
-import requests
 import pandas as pd
 import streamlit as st
 
+from utils.http import get_session
+
 BASE_URL = "https://api.sportmonks.com/football/v3"
 
 LEAGUES = [
@@ -30,7 +31,7 @@ def get_upcoming_fixtures(days_ahead: int = 3) -> pd.DataFrame:
         date = (datetime.utcnow() + timedelta(days=d)).strftime("%Y-%m-%d")
         url = f"{BASE_URL}/fixtures/date/{date}"
 
-        response = requests.get(url, headers=_headers(), timeout=20)
+        response = get_session("sportmonks").get(url, headers=_headers(), timeout=20)
         response.raise_for_status()
         data = response.json().get("data", [])
 
@@ -0,0 +1,179 @@
+"""
+utils/history.py
+----------------
+Local store of finished football-data matches.
+
+Every xG estimate used to re-download a team's last 10-15 finished matches
+each cache period, although finished results never change. MatchHistory
+keeps them in SQLite instead:
+
+  • ingestion is incremental: per competition (or per team, for sides
+    outside the ingested competitions) only matches dated from the last
+    stored one onwards are requested, at most once per INGEST_INTERVAL
+  • team form is read back with indexed queries, as match dicts in the
+    football-data shape, so the existing xG code consumes them unchanged
+
+A matchday then costs one request per competition instead of one or two
+per fixture.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from utils.fetch import fetch_all
+
+HISTORY_PATH = Path("match_history.sqlite")
+INGEST_INTERVAL = 1800       # seconds between checks of the same source
+MIN_TEAM_MATCHES = 10        # fewer stored than this -> fetch the team directly
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    match_id       INTEGER PRIMARY KEY,
+    competition_id INTEGER,
+    utc_date       TEXT NOT NULL,
+    home_id        INTEGER NOT NULL,
+    away_id        INTEGER NOT NULL,
+    home_goals     INTEGER NOT NULL,
+    away_goals     INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_matches_home ON matches (home_id, utc_date);
+CREATE INDEX IF NOT EXISTS idx_matches_away ON matches (away_id, utc_date);
+CREATE TABLE IF NOT EXISTS ingest_state (
+    source     TEXT PRIMARY KEY,
+    last_date  TEXT,
+    checked_at REAL NOT NULL
+);
+"""
+
+
+def _row(match: dict, competition_id=None):
+    """football-data match -> table row, or None if it isn't a usable finished result."""
+    score = (match.get("score") or {}).get("fullTime") or {}
+    home = (match.get("homeTeam") or {}).get("id")
+    away = (match.get("awayTeam") or {}).get("id")
+    if match.get("status") not in (None, "FINISHED") or not (match.get("id") and home and away):
+        return None
+    if score.get("home") is None or score.get("away") is None:
+        return None
+    competition_id = competition_id or (match.get("competition") or {}).get("id")
+    return (match["id"], competition_id, match.get("utcDate", ""), home, away,
+            int(score["home"]), int(score["away"]))
+
+
+def as_api_match(row) -> dict:
+    """Table row -> the football-data match fields the xG code reads."""
+    match_id, competition_id, utc_date, home_id, away_id, home_goals, away_goals = row
+    return {
+        "id": match_id,
+        "competition": {"id": competition_id},
+        "utcDate": utc_date,
+        "status": "FINISHED",
+        "homeTeam": {"id": home_id},
+        "awayTeam": {"id": away_id},
+        "score": {"fullTime": {"home": home_goals, "away": away_goals}},
+    }
+
+
+class MatchHistory:
+    """SQLite-backed finished-match store, safe to share across threads."""
+
+    def __init__(self, path=HISTORY_PATH):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(Path(path), check_same_thread=False, timeout=30)
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(SCHEMA)
+
+    # ── Ingestion ──────────────────────────────────────────────────────────────
+
+    def store(self, matches: list, competition_id=None) -> int:
+        """Insert finished matches (already stored ones are left alone). Returns rows added."""
+        rows = [r for r in (_row(m, competition_id) for m in matches) if r]
+        with self.lock, self.db:
+            before = self.db.total_changes
+            self.db.executemany("INSERT OR IGNORE INTO matches VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            return self.db.total_changes - before
+
+    def _ingest(self, source: str, fetch, endpoint: str, params: dict, competition_id=None) -> int:
+        with self.lock:
+            state = self.db.execute(
+                "SELECT last_date, checked_at FROM ingest_state WHERE source = ?", (source,)
+            ).fetchone()
+        if state and time.time() - state[1] < INGEST_INTERVAL:
+            return 0
+
+        params = {**params, "status": "FINISHED"}
+        if state and state[0]:
+            # Only what finished since the newest stored match (inclusive; duplicates are ignored)
+            params.update(dateFrom=state[0][:10], dateTo=date.today().isoformat())
+        payload = fetch(endpoint, params) or {}
+        if "matches" not in payload:
+            return 0                # failed request: leave the source due for the next check
+        matches = payload["matches"]
+        added = self.store(matches, competition_id)
+
+        dates = [m.get("utcDate") for m in matches if m.get("utcDate")]
+        last_date = max(dates + ([state[0]] if state and state[0] else []), default=None)
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO ingest_state VALUES (?, ?, ?)",
+                            (source, last_date, time.time()))
+        return added
+
+    def ingest_competition(self, fetch, competition_id: int) -> int:
+        """Pull new finished matches of one competition via ``fetch(endpoint, params)``."""
+        return self._ingest(f"competition:{competition_id}", fetch,
+                            f"competitions/{competition_id}/matches", {}, competition_id)
+
+    def ingest_team(self, fetch, team_id: int, limit: int = 15) -> int:
+        """Pull new finished matches of one team (for sides outside the ingested competitions)."""
+        return self._ingest(f"team:{team_id}", fetch, f"teams/{team_id}/matches", {"limit": limit})
+
+    # ── Queries ────────────────────────────────────────────────────────────────
+
+    def team_matches(self, team_id: int, limit: int = 15) -> list:
+        """A team's most recent finished matches, newest first."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT * FROM ("
+                " SELECT * FROM matches WHERE home_id = ?"
+                " UNION ALL SELECT * FROM matches WHERE away_id = ?"
+                ") ORDER BY utc_date DESC, match_id DESC LIMIT ?",
+                (team_id, team_id, limit),
+            ).fetchall()
+        return [as_api_match(r) for r in rows]
+
+    def frame(self, team_ids) -> pd.DataFrame:
+        """Every stored match involving any of ``team_ids``, as a DataFrame (one indexed pass)."""
+        ids = sorted({int(t) for t in team_ids})
+        marks = ",".join("?" * len(ids))
+        with self.lock:
+            return pd.read_sql_query(
+                f"SELECT * FROM matches WHERE home_id IN ({marks})"
+                f" UNION SELECT * FROM matches WHERE away_id IN ({marks})",
+                self.db, params=ids + ids,
+            )
+
+    def team_form(self, team_id: int, fetch, limit: int = 15) -> list:
+        """``team_matches``, topping the store up from the team endpoint when it has too few."""
+        matches = self.team_matches(team_id, limit)
+        if len(matches) < min(limit, MIN_TEAM_MATCHES) and self.ingest_team(fetch, team_id, limit):
+            matches = self.team_matches(team_id, limit)
+        return matches
+
+
+@st.cache_resource
+def get_match_history() -> MatchHistory:
+    """The process-wide handle on the match-history store."""
+    return MatchHistory()
+
+
+def sync_competitions(fetch, competition_ids) -> int:
+    """Incrementally ingest every competition; returns matches added."""
+    history = get_match_history()
+    return sum(fetch_all(lambda cid: history.ingest_competition(fetch, cid), list(competition_ids)))
@@ -0,0 +1,69 @@
+"""
+utils/http.py
+-------------
+Shared HTTP client layer.
+
+Every API helper used to call bare ``requests.get``, paying a fresh
+TCP + TLS handshake on each of the hundreds of calls per matchday. Here one
+pooled ``requests.Session`` per provider keeps connections alive. Its
+adapter retries connection errors and 5xx responses with backoff,
+responses are gzip-compressed, and ``st.cache_resource`` shares it across
+reruns and sessions.
+
+Each provider's session also carries its rate limiter (utils.ratelimit) and
+the on-disk response cache (utils.http_cache). A cache hit costs neither a
+request nor a token. 429s are retried by the caller, which knows the
+provider's error format.
+"""
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.http_cache import CachingAdapter, ResponseCache
+from utils.ratelimit import get_limiter
+
+POOL_SIZE      = 16             # keep-alive connections per host
+MAX_RETRIES    = 3
+RETRY_BACKOFF  = 0.5            # seconds, doubled each attempt
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+def build_session(pool_size: int = POOL_SIZE, retries: int = MAX_RETRIES,
+                  backoff: float = RETRY_BACKOFF, cache: ResponseCache = None,
+                  limiter=None) -> requests.Session:
+    """
+    A keep-alive session with a sized connection pool and adapter-level
+    retries; with a ``cache``, GETs are served from / stored in it and
+    network calls take a token from ``limiter`` first.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,          # hand the last response back to the caller
+    )
+    pool = dict(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    adapter = CachingAdapter(cache, limiter, **pool) if cache is not None else HTTPAdapter(**pool)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate", "Accept": "application/json"})
+    return session
+
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """The process-wide handle on the on-disk response cache."""
+    return ResponseCache()
+
+
+@st.cache_resource
+def get_session(provider: str = "default", pool_size: int = POOL_SIZE,
+                retries: int = MAX_RETRIES) -> requests.Session:
+    """One pooled session per provider, shared by every rerun and browser session."""
+    return build_session(pool_size, retries, cache=get_response_cache(),
+                         limiter=get_limiter(provider))
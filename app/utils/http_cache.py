@@ -0,0 +1,176 @@
+"""
+utils/http_cache.py
+-------------------
+Persistent on-disk HTTP response cache.
+
+``st.cache_data`` lives in one process's memory, so every deploy, restart
+or new worker re-downloaded the full fixture list and every team history.
+CachingAdapter sits inside the pooled sessions of utils.http and keeps GET
+responses in SQLite, so a restarted app starts warm:
+
+  • key   : normalized URL (scheme/host lower-cased, query sorted, API
+            tokens stripped), so secrets never reach the disk and param
+            order doesn't matter
+  • TTL   : per endpoint (ENDPOINT_TTLS, first match wins); fresh entries
+            are served without touching the network or the rate limiter.
+            Result lists that can still grow ("last N" finished matches,
+            date windows reaching today) only get OPEN_LIST_TTL; a window
+            that ended before today is immutable and kept for a day
+  • stale : revalidated with If-None-Match / If-Modified-Since; a 304
+            refreshes the entry and serves the stored body
+
+Only 200 responses are stored.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+CACHE_PATH = Path("http_cache.sqlite")
+
+# Query params that carry credentials: never part of a key, never stored
+SECRET_PARAMS = {"api_token", "token", "api_key", "apikey", "key"}
+
+# Lists that gain entries as matches finish; kept below history.INGEST_INTERVAL
+# so a scheduled ingestion check always reaches the server
+OPEN_LIST_TTL = 300
+# Date windows that ended before today no longer change
+CLOSED_WINDOW_TTL = 24 * 3600
+
+# (pattern over the normalized URL, seconds); first match wins
+ENDPOINT_TTLS = [
+    (re.compile(r"/matches\?(.*&)?status=FINISHED"), OPEN_LIST_TTL),  # last N / new results
+    (re.compile(r"/matches/\d+$"), 600),                           # single match status
+    (re.compile(r"/competitions/\d+/matches"), 1800),              # fixture lists
+    (re.compile(r"/fixtures/date/"), 1800),
+    (re.compile(r"/fixtures/between/|/expected/fixtures"), OPEN_LIST_TTL),
+]
+DEFAULT_TTL = 1800
+
+# Last day of a date window: football-data ``dateTo``, SportMonks ``between/date/{from}/{to}``
+WINDOW_END = re.compile(r"[?&]dateTo=(\d{4}-\d{2}-\d{2})|/between/date/[\d-]+/(\d{4}-\d{2}-\d{2})")
+
+# Response headers worth keeping (bodies are stored decoded)
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Date")
+
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path,
+                       urlencode(query), ""))
+
+
+def ttl_for(key: str) -> int:
+    window = WINDOW_END.search(key)
+    if window and (window.group(1) or window.group(2)) < date.today().isoformat():
+        return CLOSED_WINDOW_TTL
+    return next((ttl for pattern, ttl in ENDPOINT_TTLS if pattern.search(key)), DEFAULT_TTL)
+
+
+class ResponseCache:
+    """SQLite store of ``key -> (headers, body, fetched_at)``; safe across threads and processes."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, headers TEXT NOT NULL,"
+                " body BLOB NOT NULL, fetched_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT headers, body, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def put(self, key: str, headers: dict, body: bytes):
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, json.dumps(headers), body, time.time()),
+            )
+
+    def touch(self, key: str):
+        with self.lock, self.db:
+            self.db.execute("UPDATE responses SET fetched_at = ? WHERE key = ?", (time.time(), key))
+
+    def clear(self):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM responses")
+
+
+def _cached_response(request, headers: dict, body: bytes) -> Response:
+    resp = Response()
+    resp.status_code = 200
+    resp.headers = CaseInsensitiveDict(headers)
+    resp._content = body
+    resp.url = request.url
+    resp.request = request
+    resp.reason = "OK"
+    resp.encoding = "utf-8"
+    resp.from_cache = True
+    return resp
+
+
+class CachingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that answers GETs from a ResponseCache when it can, and
+    otherwise takes a token from ``limiter`` (if any) before the real call.
+    """
+
+    def __init__(self, cache: ResponseCache, limiter=None, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.limiter = limiter
+
+    def send(self, request, **kwargs):
+        if request.method != "GET":
+            return self._send(request, **kwargs)
+
+        key = normalize_url(request.url)
+        entry = self.cache.get(key)
+        if entry is not None:
+            headers, body, fetched_at = entry
+            if time.time() - fetched_at < ttl_for(key):
+                return _cached_response(request, headers, body)
+            # Stale: ask the server whether it changed
+            if headers.get("ETag"):
+                request.headers["If-None-Match"] = headers["ETag"]
+            if headers.get("Last-Modified"):
+                request.headers["If-Modified-Since"] = headers["Last-Modified"]
+
+        resp = self._send(request, **kwargs)
+        if resp.status_code == 304 and entry is not None:
+            self.cache.touch(key)
+            return _cached_response(request, entry[0], entry[1])
+        if resp.status_code == 200:
+            kept = {h: resp.headers[h] for h in KEPT_HEADERS if h in resp.headers}
+            self.cache.put(key, kept, resp.content)
+        return resp
+
+    def _send(self, request, **kwargs):
+        if self.limiter is not None:
+            self.limiter.acquire()
+        resp = super().send(request, **kwargs)
+        if self.limiter is not None:
+            self.limiter.update(resp.headers, resp.status_code)
+        return resp
@@ -0,0 +1,108 @@
+"""
+utils/ratelimit.py
+------------------
+Per-provider token-bucket rate limiting.
+
+Instead of sleeping blindly (a flat 60 s after a 429, 0.2 s per
+competition, independent backoff in every call), every request takes a
+token from its provider's bucket first. The bucket refills at the
+provider's quota, so requests go out as fast as the quota allows and no
+faster.
+
+One bucket per provider is shared by every thread, asyncio task and
+Streamlit session in the process (``st.cache_resource``). Tokens are
+handed out as reservations under a short lock: a caller learns how long to
+wait and sleeps outside the lock (``time.sleep`` or ``asyncio.sleep``).
+Server hints override the local estimate: ``Retry-After`` and
+football-data's ``X-Requests-Available-Minute`` /
+``X-RequestCounter-Reset`` headers, or SportMonks' ``rate_limit`` block.
+"""
+
+import asyncio
+import threading
+import time
+
+import streamlit as st
+
+# Requests per minute and burst size per provider
+PROVIDER_LIMITS = {
+    "football-data": (10, 10),       # free tier: 10 requests / minute
+    "sportmonks":    (50, 10),       # 3000 / hour per entity
+}
+DEFAULT_LIMIT = (30, 5)
+# Pause after a 429 that came without any timing hint
+DEFAULT_PENALTY = 60.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``acquire`` blocks, ``acquire_async`` awaits."""
+
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token now and return how many seconds to wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def block_for(self, seconds: float):
+        """No request goes out for ``seconds`` (e.g. a server-imposed pause)."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def set_remaining(self, remaining: int, reset_in: float = None):
+        """Trust the server's count of requests left in the current window."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, float(remaining))
+        if remaining <= 0 and reset_in:
+            self.block_for(reset_in)
+
+    def update(self, headers, status: int = 200):
+        """Apply rate-limit response headers; a 429 always pauses the bucket."""
+        available = _number(headers.get("X-Requests-Available-Minute"))
+        reset_in = _number(headers.get("X-RequestCounter-Reset"))
+        if available is not None:
+            self.set_remaining(int(available), reset_in)
+
+        retry_after = _number(headers.get("Retry-After"))
+        if retry_after is not None:
+            self.block_for(retry_after)
+        elif status == 429:
+            self.block_for(reset_in or DEFAULT_PENALTY)
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@st.cache_resource
+def get_limiter(provider: str) -> TokenBucket:
+    """The process-wide bucket for ``provider``."""
+    return TokenBucket(*PROVIDER_LIMITS.get(provider, DEFAULT_LIMIT))
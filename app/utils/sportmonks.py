@@ -20,6 +20,9 @@ import requests
 import pandas as pd
 import streamlit as st
 
+from utils.http import get_session
+from utils.ratelimit import get_limiter
+
 logger = logging.getLogger(__name__)
 
 # ── Constants ──────────────────────────────────────────────────────────────────
@@ -37,7 +40,8 @@ def _get(url: str, params: dict | None = None) -> dict:
     """
     GET request with:
       • API key injected as query param (SportMonks v3 standard)
-      • Retry on 429 / 5xx with exponential backoff
+      • Shared per-provider token bucket; 429s pause it per the server's hints
+      • Retry on 5xx with exponential backoff
       • Graceful handling of every failure mode
       • Never raises — always returns dict (empty on any error)
     """
@@ -55,16 +59,18 @@ def _get(url: str, params: dict | None = None) -> dict:
         )
         return {}
 
+    # Pooled keep-alive session; retries stay in the loop below
+    session = get_session("sportmonks", retries=0)
+    limiter = get_limiter("sportmonks")
     resp = None
     for attempt in range(1, MAX_RETRIES + 1):
         try:
-            resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+            # Rate limiting and the on-disk response cache live in the session
+            resp = session.get(url, params=params, timeout=REQUEST_TIMEOUT)
 
-            # ── Rate limit ─────────────────────────────────────────────────────
+            # ── Rate limit — the shared bucket now holds every caller back ─────
             if resp.status_code == 429:
-                wait = RETRY_BACKOFF ** attempt
-                logger.warning("Rate limited. Waiting %ss (attempt %s/%s)", wait, attempt, MAX_RETRIES)
-                time.sleep(wait)
+                logger.warning("Rate limited (attempt %s/%s)", attempt, MAX_RETRIES)
                 continue
 
             # ── Server error — retry ───────────────────────────────────────────
@@ -88,6 +94,13 @@ def _get(url: str, params: dict | None = None) -> dict:
 
             payload = resp.json()
 
+            # ── Remaining quota reported in the body ───────────────────────────
+            rate_limit = payload.get("rate_limit") if isinstance(payload, dict) else None
+            if (isinstance(rate_limit, dict) and "remaining" in rate_limit
+                    and not getattr(resp, "from_cache", False)):
+                limiter.set_remaining(int(rate_limit["remaining"]),
+                                      _safe_float(rate_limit.get("resets_in_seconds"), 0.0))
+
             # ── Guard: SportMonks wraps some errors as JSON with "message" ─────
             if isinstance(payload, dict) and "message" in payload and "data" not in payload:
                 logger.error("API error message: %s", payload["message"])
@@ -219,24 +232,21 @@ def get_upcoming_fixtures() -> pd.DataFrame:
     return df if not df.empty else EMPTY
 
 
-def get_team_xg(team_id: int, home: bool = True, matches: int = 8) -> float:
+# Home / away multipliers and fallbacks applied to a team's base rate
+SIDE_MULTIPLIER = {True: 1.05, False: 0.95}
+DEFAULT_TEAM_XG = {True: 1.35, False: 1.05}
+
+
+@st.cache_data(ttl=7200, show_spinner=False)
+def get_team_base_xg(team_id: int, matches: int = 8) -> float | None:
     """
-    Rolling average xG for a team. Never raises — always returns float.
+    Unadjusted rolling average for a team, or None without usable history.
+    Cached once per team: home and away figures are both derived from it.
 
     Priority:
       1. /v3/football/expected/fixtures  (real xG data)
       2. /v3/football/fixtures/between   (goals as proxy)
-      3. Hardcoded realistic European average
     """
-    # ── Guard ──────────────────────────────────────────────────────────────────
-    try:
-        team_id = int(team_id)
-        assert team_id > 0
-    except (TypeError, ValueError, AssertionError):
-        return 1.35 if home else 1.05
-
-    mult = 1.05 if home else 0.95
-
     # ── 1. Real xG endpoint ────────────────────────────────────────────────────
     try:
         records = _paginate(
@@ -257,7 +267,7 @@ def get_team_xg(team_id: int, home: bool = True, matches: int = 8) -> float:
                 if v >= 0:
                     xg_vals.append(v)
         if xg_vals:
-            return round(sum(xg_vals) / len(xg_vals) * mult, 3)
+            return sum(xg_vals) / len(xg_vals)
     except Exception as e:
         logger.warning("xG endpoint error for team %s: %s", team_id, e)
 
@@ -304,10 +314,28 @@ def get_team_xg(team_id: int, home: bool = True, matches: int = 8) -> float:
                 break
 
         if goals:
-            return round(sum(goals) / len(goals) * mult, 3)
+            return sum(goals) / len(goals)
 
     except Exception as e:
         logger.warning("Goals fallback error for team %s: %s", team_id, e)
 
-    # ── 3. Realistic European average ─────────────────────────────────────────
-    return 1.35 if home else 1.05
+    return None
+
+
+def get_team_xg(team_id: int, home: bool = True, matches: int = 8) -> float:
+    """
+    Rolling average xG for a team. Never raises — always returns float.
+    Falls back to a realistic European average without history.
+    """
+    try:
+        team_id = int(team_id)
+        assert team_id > 0
+    except (TypeError, ValueError, AssertionError):
+        return DEFAULT_TEAM_XG[home]
+    return _side_xg(get_team_base_xg(team_id, matches), home)
+
+
+def _side_xg(base: float | None, home: bool) -> float:
+    if base is None:
+        return DEFAULT_TEAM_XG[home]
+    return round(base * SIDE_MULTIPLIER[home], 3)